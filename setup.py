@@ -1,22 +1,33 @@
-import distutils.command.build
 import os
+import sys
 
 import setuptools
+import setuptools.command.build_ext
 
 here = os.path.abspath(os.path.dirname(__file__))
 
 long_description = open(os.path.join(here, "README.md")).read()
 
+if sys.platform == "win32":
+    openmp_compile_args, openmp_link_args = ["/openmp"], []
+elif sys.platform == "darwin":
+    # Apple's compiler does not support OpenMP: the kernels run on one thread
+    openmp_compile_args, openmp_link_args = [], []
+else:
+    openmp_compile_args, openmp_link_args = ["-fopenmp"], ["-fopenmp"]
+
 mpf_extension = setuptools.Extension(
-    name="erwin.mt_map.mpf", sources=["src/erwin/mt_map/mpf.pyx"])
+    name="erwin.mt_map.mpf", sources=["src/erwin/mt_map/mpf.pyx"],
+    extra_compile_args=openmp_compile_args, 
+    extra_link_args=openmp_link_args)
 
-class build(distutils.command.build.build):
+class build_ext(setuptools.command.build_ext.build_ext):
     def finalize_options(self):
         import Cython.Build
         
-        super().finalize_options()
         self.distribution.ext_modules = Cython.Build.cythonize(
             [mpf_extension], language_level=3)
+        super().finalize_options()
 
 setuptools.setup(
     name="erwin",
@@ -67,10 +78,10 @@ setuptools.setup(
     python_requires=">=3.7",
     
     setup_requires=["cython"],
-    cmdclass={"build": build},
+    cmdclass={"build_ext": build_ext},
     
     install_requires=[
-        "cython", "docutils", "doit", "meg", "nibabel", "numpy",
+        "docutils", "doit", "meg", "nibabel", "numpy",
         "pydicom", "scipy", "sphinx", "spire-pipeline>=1.1.1"],
     
     entry_points={ "console_scripts": [ "erwin=erwin.__main__:main"] },
@@ -1,27 +1,41 @@
 import argparse
+import importlib
 import logging
 import os
 import re
-import subprocess
+import sys
 
-import nibabel
-import numpy
+from . import image_cache, precision
+from .runner import run
 
-def run(tasks):
-    """ Run the given Spire tasks in order.
+def entrypoint(class_, aliases=None):
+    """ Create a main-like function from a task class and a dictionary-based
+        description of the command-line arguments. Options to set the 
+        verbosity, to trace the execution and to set the precision of the
+        computations are automatically added.
     """
     
-    for task in tasks:
-        for action in task.actions:
-            if isinstance(action, list):
-                subprocess.check_call(action)
-            elif isinstance(action, tuple):
-                action[0](*action[1])
+    parser = get_parser(class_, aliases)
+    arguments = vars(parser.parse_args())
+    
+    logging.getLogger().setLevel(
+        getattr(logging, arguments["verbosity"].upper()))
+    del arguments["verbosity"]
+    trace = arguments.pop("trace")
+    dtype = arguments.pop("precision")
+    
+    try:
+        with precision.using(dtype):
+            task = class_(**arguments)
+        run([task], trace=trace)
+    except Exception as e:
+        if logging.getLogger().getEffectiveLevel() > logging.DEBUG:
+            parser.error(e)
+        else:
+            raise
 
-def entrypoint(class_, aliases=None):
-    """ Create a main-like function from a task class and a dictionary-based
-        description of the command-line arguments. An option to set the 
-        verbosity is automatically added.
+def get_parser(class_, aliases=None):
+    """ Return the command-line parser of a task class, see entrypoint.
     """
     
     aliases = aliases or {}
@@ -30,6 +44,14 @@ def entrypoint(class_, aliases=None):
         "--verbosity", "-v", default="warning",
         choices=["debug", "info", "warning", "error", "critical"],
         help="Set the verbosity level (defaults to \"warning\")")
+    parser.add_argument(
+        "--trace", metavar="PATH",
+        help="Record the time, memory and I/O of the method in a trace file")
+    parser.add_argument(
+        "--precision", default=precision.get_dtype(), choices=precision.dtypes,
+        help=(
+            "Floating-point type of the computations and of the results "
+            "(defaults to \"{}\")".format(precision.get_dtype())))
     for name, options in cli.get_arguments(class_):
         names = [name]
         name_aliases = aliases.get(name.split("--", 1)[1].replace("-", "_"))
@@ -54,20 +76,8 @@ def entrypoint(class_, aliases=None):
             action.metavar = tuple(
                 "{}{}".format(names[0].lstrip("-")[0].upper(), x)
                 for x in range(1, 3))
-    arguments = vars(parser.parse_args())
     
-    logging.getLogger().setLevel(
-        getattr(logging, arguments["verbosity"].upper()))
-    del arguments["verbosity"]
-    
-    try:
-        task = class_(**arguments)
-        run([task])
-    except Exception as e:
-        if logging.getLogger().getEffectiveLevel() > logging.DEBUG:
-            parser.error(e)
-        else:
-            raise
+    return parser
 
 def parse_slice(string):
     match = re.match("^\[(.+)\]$", string)
@@ -92,8 +102,15 @@ def parse_slice(string):
     return tuple(items)
 
 def load(string):
+    # NOTE: nibabel is imported here to reduce the start-up time of methods
+    # which do not use images.
+    import nibabel
+    
+    cache = image_cache.get_cache()
+    
     if os.path.isfile(string):
-        return nibabel.load(string)
+        image = cache.get(string) if cache is not None else None
+        return image if image is not None else nibabel.load(string)
     else:
         # NOTE: may be a pathlib.Path
         match = re.match(r"^(.+)(\[.+\])$", str(string))
@@ -102,16 +119,33 @@ def load(string):
         path, slice_string = match.groups()
         if not os.path.isfile(path):
             raise FileNotFoundError(f"No such file or no access: '{path}'")
-        image = nibabel.load(path)
+        image = cache.get(path) if cache is not None else None
+        if image is None:
+            image = nibabel.load(path)
         slice_ = parse_slice(slice_string)
         if not slice_:
             raise ValueError(f"Invalid slice: '{slice_string}'")
 
-        subset = nibabel.Nifti1Image(
-            numpy.array(image.dataobj)[slice_], image.affine)
+        # NOTE: slicing the array proxy only reads the selected voxels from
+        # the file. Compressed files are read up to the last selected voxel,
+        # unless indexed_gzip is installed, in which case nibabel uses its
+        # seek points for random access.
+        subset = nibabel.Nifti1Image(image.dataobj[slice_], image.affine)
 
         return subset
 
+def save(image, path):
+    """ Save the image, and store it in the active image cache so that later
+        calls to load do not read it from disk.
+    """
+    
+    import nibabel
+    
+    nibabel.save(image, path)
+    cache = image_cache.get_cache()
+    if cache is not None:
+        cache.put(path, image)
+
 def get_path(string):
     # NOTE: may be a pathlib.Path
     match = re.match(r"^(.+)(\[.+\])$", str(string))
@@ -120,7 +154,33 @@ def get_path(string):
     else:
         return match.group(1)
 
-from . import (
-    cli, b0_map, b1_map, cbf, diffusion, meta_data, misc, moco, mt_map, qsm,
-    segmentation, t1_map, t2_map
-)
+def lazy_import(package, attributes):
+    """ Return the module-level __getattr__ and __dir__ functions of a package
+        which import its attributes on first access.
+        
+        :param package: name of the package
+        :param attributes: mapping of attribute names to the name of the
+            module defining it, relative to the package. Attributes equal to
+            their module name are sub-modules.
+    """
+    
+    def __getattr__(name):
+        module_name = attributes.get(name)
+        if module_name is None:
+            raise AttributeError(
+                "module {!r} has no attribute {!r}".format(package, name))
+        module = importlib.import_module(
+            "{}.{}".format(package, module_name))
+        return module if name == module_name else getattr(module, name)
+    
+    def __dir__():
+        return sorted([*vars(sys.modules[package]), *attributes])
+    
+    return __getattr__, __dir__
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        x: x for x in [
+            "cli", "b0_map", "b1_map", "cbf", "diffusion", "epg", "meta_data",
+            "misc", "moco", "mt_map", "qsm", "segmentation", "t1_map",
+            "t2_map"]})
@@ -1,13 +1,10 @@
 import importlib
-import inspect
-import re
 import os
 import shutil
 import sys
 import textwrap
-import unittest.mock
 
-from . import entrypoint
+from .registry import get_registry
 
 def main():
     return_code = 0
@@ -16,6 +13,9 @@ def main():
         help()
     elif sys.argv[1] in ["--list", "-l"]:
         list()
+    elif sys.argv[1] == "batch":
+        from . import batch
+        return_code = batch.main(sys.argv[2:])
     else:
         return_code = run(sys.argv[1], sys.argv[1:])
     
@@ -26,7 +26,9 @@ def help():
     """
     
     usage = textwrap.dedent("""\
-        usage: {} [-h|-l]
+        usage: {0} [-h|-l]
+               {0} <module> [arguments]
+               {0} batch <module> <manifest> [-j JOBS]
         
         optional arguments:
           -h, --help            show this help message and exit
@@ -38,34 +40,9 @@ def list():
     """ Show the list of submodules.
     """
     
-    package = sys.modules[__name__].__package__
-    stack = [sys.modules[package]]
-    scanned = set()
+    registry = get_registry()
     
-    modules = []
-    while stack:
-        module = stack.pop()
-        scanned.add(id(module))
-        for name, value in module.__dict__.items():
-            if (
-                    not inspect.ismodule(value)
-                    or not value.__package__.startswith(package)
-                    or name == "__main__"):
-                continue
-            if id(value) in scanned:
-                continue
-            stack.append(value)
-            scanned.add(id(value))
-            if "main" not in dir(value):
-                continue
-            
-            full_name = "{}.{}".format(value.__package__, name)
-            # NOTE: the "entrypoint" function is a relative import in the 
-            # modules, and must then be patched at the individual module level,
-            # not at its original definition.
-            with unittest.mock.patch("{}.entrypoint".format(full_name), get_doc):
-                doc = getattr(value, "main")()
-                modules.append([full_name[1+len(package):], doc])
+    modules = [[x, y] for x, y in registry.items() if "." in x]
     
     max_name_length = max([len(x[0].split(".", 1)[1]) for x in modules])
     doc_width = min(110, shutil.get_terminal_size()[0]) - max_name_length - 1
@@ -78,9 +55,7 @@ def list():
             print(
                 "{}{}{}".format(
                     package_name, (max_name_length-len(package_name)+3)*" ",
-                    get_doc(
-                        sys.modules["{}.{}".format(package, package_name)],
-                        None)))
+                    registry[package_name]))
             current_package_name = package_name
         doc_lines = textwrap.wrap(doc, doc_width)
         print(
@@ -99,26 +74,17 @@ def run(module_name, arguments):
     module_name = module_name.strip(".")
     
     return_code = 0
-    try:
-        module = importlib.import_module(
-            "{}.{}".format(sys.modules[__name__].__package__, module_name))
-    except ModuleNotFoundError as e:
-        print("No such module: {}\n".format(e))
+    if "." not in module_name or module_name not in get_registry():
+        print("No such module: {}\n".format(module_name))
         help()
         return_code = 1
     else:
+        module = importlib.import_module(
+            "{}.{}".format(sys.modules[__name__].__package__, module_name))
         sys.argv = arguments
         return_code = module.main()
     
     return return_code
 
-def get_doc(class_, _=None):
-    """ Return the first paragraph of the specified class docstring.
-    """
-    
-    paragraph = re.split("^\s*$", (class_.__doc__ or "").strip(), flags=re.MULTILINE)[0]
-    paragraph = re.sub("\s+", " ", paragraph)
-    return paragraph
-
 if __name__ == "__main__":
     sys.exit(main())
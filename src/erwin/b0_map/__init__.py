@@ -1,4 +1,9 @@
 """ B₀ mapping
 """
 
-from .double_echo import DoubleEcho
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "DoubleEcho": "double_echo",
+        "MultiEcho": "multi_echo"})
@@ -2,8 +2,9 @@ import nibabel
 import numpy
 import spire
 
-from .. import entrypoint, get_path, load
+from .. import entrypoint, get_path, load, precision, save
 from ..cli import *
+from ..misc.phase_unwrapping import PhaseUnwrapping
 
 class DoubleEcho(spire.TaskFactory):
     """ ΔB₀ map (in Hz) using the phase difference between two echoes.
@@ -15,11 +16,14 @@ class DoubleEcho(spire.TaskFactory):
     
     def __init__(self, 
             magnitude: Tuple[str,str], phase: Tuple[str,str],
-            echo_times: Tuple[float,float], target: str):
+            echo_times: Tuple[float,float], target: str, unwrap: Flag=False,
+            threads: Optional[int]=None):
         """ :param magnitude: Path to magnitude images
             :param phase: Path to phase images
             :param echo_times: Echo times (s)
             :param target: Path to target ΔB₀ map (Hz)
+            :param unwrap: Unwrap the phase difference (Laplacian method), for ΔB₀ larger than 1/(2ΔTE)
+            :param threads: Number of threads of the unwrapping, defaults to all CPUs
         """
         
         spire.TaskFactory.__init__(self, str(target))
@@ -28,22 +32,34 @@ class DoubleEcho(spire.TaskFactory):
         self.targets = [target]
         
         self.actions = [
-            (DoubleEcho.b0_map, (magnitude, phase, echo_times, target))]
+            (
+                DoubleEcho.b0_map, (
+                    magnitude, phase, echo_times, target,
+                    precision.get_dtype(), unwrap, threads))]
     
     @staticmethod
-    def b0_map(magnitude_paths, phase_paths, echo_times, B0_map_path):
+    def b0_map(
+            magnitude_paths, phase_paths, echo_times, B0_map_path,
+            dtype="float64", unwrap=False, threads=None):
         magnitude = [load(x) for x in magnitude_paths]
         phase = [load(x) for x in phase_paths]
         
-        # Complex signal for the two echoes
-        S = [
-            m.get_fdata() * numpy.exp(1j*p.get_fdata())
-            for m,p in zip(magnitude, phase)]
+        # Complex signal for the two echoes, complex64 for float32 data
+        S = []
+        for m, p in zip(magnitude, phase):
+            signal = numpy.zeros(m.shape, precision.get_complex_dtype(dtype))
+            signal.imag = p.get_fdata(dtype=dtype)
+            numpy.exp(signal, out=signal)
+            signal *= m.get_fdata(dtype=dtype)
+            S.append(signal)
         
         # Un-normalized, complex, phase difference
         delta_phase = S[1] * S[0].conj()
         # Real phase difference
         delta_phase = numpy.angle(delta_phase)
+        if unwrap:
+            delta_phase = PhaseUnwrapping.unwrap(
+                delta_phase, magnitude[0].header.get_zooms()[:3], threads)
         
         # Difference between echo times in seconds.
         delta_TE = (echo_times[1] - echo_times[0])
@@ -51,7 +67,7 @@ class DoubleEcho(spire.TaskFactory):
         # ΔB₀ map in Hz
         B0_map = delta_phase / (2*numpy.pi*delta_TE)
         
-        nibabel.save(
+        save(
             nibabel.Nifti1Image(B0_map, magnitude[0].affine), B0_map_path)
 
 def main():
@@ -0,0 +1,122 @@
+import nibabel
+import numpy
+import spire
+
+from .. import entrypoint, get_path, load, precision, save
+from ..slabs import SlabReader
+from ..cli import *
+
+class MultiEcho(spire.TaskFactory):
+    """ ΔB₀ map (in Hz) using the phase evolution over multiple echoes.
+        
+        The phase differences between successive echoes are accumulated to
+        obtain the phase of each echo relative to the first one, and the ΔB₀
+        is the slope of a linear fit of this phase against the echo time,
+        weighted by the squared magnitude of the echoes. With two echoes, the
+        result is the same as DoubleEcho.
+    """
+    
+    def __init__(self,
+            magnitude: Tuple[str, ...], phase: Tuple[str, ...],
+            echo_times: Tuple[float, ...], target: str):
+        """ :param magnitude: Path to magnitude images
+            :param phase: Path to phase images
+            :param echo_times: Echo times (s)
+            :param target: Path to target ΔB₀ map (Hz)
+        """
+        
+        spire.TaskFactory.__init__(self, str(target))
+        
+        if not len(magnitude) == len(phase) == len(echo_times):
+            raise Exception(
+                "Magnitude, phase and echo times must have the same length")
+        if len(echo_times) < 2:
+            raise Exception("At least two echoes are required")
+        
+        self.file_dep = [get_path(x) for x in [*magnitude, *phase]]
+        self.targets = [target]
+        
+        self.actions = [
+            (
+                MultiEcho.b0_map, (
+                    magnitude, phase, echo_times, target,
+                    precision.get_dtype()))]
+    
+    @staticmethod
+    def b0_map(
+            magnitude_paths, phase_paths, echo_times, B0_map_path,
+            dtype="float64", slab_size=2**22):
+        """ Compute the ΔB₀ map by slabs of about slab_size voxels along the
+            third axis, so that only two complex slabs are in memory at the
+            same time. The complex signals are computed in complex64 whatever
+            the precision, and the regression sums in the precision of the
+            result. Compressed images are read as streams, see SlabReader.
+        """
+        
+        magnitude = [SlabReader(load(x)) for x in magnitude_paths]
+        phase = [SlabReader(load(x)) for x in phase_paths]
+        
+        shape = magnitude[0].image.shape
+        slices_count = max(1, slab_size // int(numpy.prod(shape[:2])))
+        
+        # Echo times relative to the first one
+        times = [x-echo_times[0] for x in echo_times]
+        
+        B0_map = numpy.empty(shape[:3], dtype)
+        for start in range(0, shape[2], slices_count):
+            stop = start+slices_count
+            
+            # Weighted sums of the linear regression of the phase against
+            # the echo time.
+            sums = {x: 0 for x in ["w", "t", "tt", "p", "tp"]}
+            accumulated_phase, previous = 0, None
+            for m, p, t in zip(magnitude, phase, times):
+                m_slab = numpy.asarray(m.read(start, stop), numpy.float32)
+                S = MultiEcho.get_signal(m_slab, p.read(start, stop))
+                
+                if previous is not None:
+                    # Un-normalized, complex, phase difference with the
+                    # previous echo
+                    accumulated_phase = (
+                        accumulated_phase
+                        + numpy.angle(S * previous.conj()).astype(dtype))
+                previous = S
+                
+                w = numpy.square(m_slab, dtype=dtype)
+                sums["w"] = sums["w"] + w
+                sums["t"] = sums["t"] + w*t
+                sums["tt"] = sums["tt"] + w*t**2
+                sums["p"] = sums["p"] + w*accumulated_phase
+                sums["tp"] = sums["tp"] + w*t*accumulated_phase
+                del m_slab, w
+            del S, previous, accumulated_phase
+            
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                slope = (
+                    (sums["w"]*sums["tp"] - sums["t"]*sums["p"])
+                    / (sums["w"]*sums["tt"] - sums["t"]**2))
+            
+            # ΔB₀ map in Hz
+            B0_map[:, :, start:stop] = slope / (2*numpy.pi)
+        
+        for reader in [*magnitude, *phase]:
+            reader.close()
+        
+        save(
+            nibabel.Nifti1Image(B0_map, magnitude[0].image.affine),
+            B0_map_path)
+    
+    @staticmethod
+    def get_signal(magnitude, phase):
+        """ Return the complex signal (complex64) of slabs of magnitude and
+            phase.
+        """
+        
+        S = numpy.zeros(numpy.shape(magnitude), numpy.complex64)
+        S.imag = phase
+        numpy.exp(S, out=S)
+        S *= magnitude
+        return S
+
+def main():
+    return entrypoint(MultiEcho, {"echo_times": "te"})
@@ -1,4 +1,8 @@
 """ B₁ mapping
 """
 
-from .afi import AFI
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "AFI": "afi"})
@@ -1,47 +1,137 @@
+import functools
+import logging
+
 import nibabel
 import numpy
 import spire
 
-from .. import entrypoint, get_path, load
+from .. import cache, entrypoint, epg, get_path, load, precision, save
 from ..cli import *
 
 class AFI(spire.TaskFactory):
     """ Relative B1 map from an AFI sequence.
         
-        Reference: Actual flip-angle imaging in the pulsed steady state: A 
-        method for rapid three-dimensional mapping of the transmitted 
-        radiofrequency field. Yarnykh. Magnetic Resonance in Medicine 57(1).
-        2007.
+        The actual flip angle is either computed with the closed form of 
+        Yarnykh, which assumes an ideal spoiling, or interpolated in a lookup
+        table of the signal ratio simulated with the extended phase graphs for
+        the RF and gradient spoiling of the protocol.
+        
+        References:
+        
+        - Actual flip-angle imaging in the pulsed steady state: A method for
+          rapid three-dimensional mapping of the transmitted radiofrequency
+          field. Yarnykh. Magnetic Resonance in Medicine 57(1). 2007.
+        - On the steady-state properties of actual flip angle imaging (AFI).
+          Nehrke. Magnetic Resonance in Medicine 61(1). 2009.
     """
     
     def __init__(
             self, sources: Tuple[str, str], flip_angle: float, tr_ratio: float,
-            target: str):
+            target: str,
+            spoiling: Optional[Choice["ideal", "simulated"]]="ideal",
+            repetition_time: Optional[float]=None,
+            phase_increment: Optional[float]=None,
+            T1_range: Optional[Tuple[float, float]]=None):
         """ :param sources: Path to the magnitude images
             :param flip_angle: Flip angle (rad)
             :param tr_ratio: Ratio between the two TR
             :param target: Path to the target relative B1 map
+            :param spoiling: Model of the spoiling, ideal (closed form) or simulated (lookup table)
+            :param repetition_time: Shortest repetition time (s), required for the simulated spoiling
+            :param phase_increment: RF spoiling phase increment (rad) for the simulated spoiling, defaults to 129.3°
+            :param T1_range: Range of T₁ (s) over which the simulated signal ratio is averaged, defaults to 0.5 s to 2 s
         """
         spire.TaskFactory.__init__(self, str(target))
         
+        if spoiling == "simulated" and repetition_time is None:
+            raise Exception(
+                "The simulated spoiling requires the repetition time")
+        
         self.file_dep = [get_path(x) for x in sources]
         self.targets = [target]
         
-        self.actions = [(AFI.b1_map, (sources, flip_angle, tr_ratio, target))]
+        if spoiling == "simulated":
+            lookup_table = (
+                repetition_time, 
+                numpy.radians(129.3) if phase_increment is None 
+                    else phase_increment,
+                tuple(T1_range or (0.5, 2)))
+        else:
+            lookup_table = None
+        
+        self.actions = [
+            (
+                AFI.b1_map, (
+                    sources, flip_angle, tr_ratio, target,
+                    precision.get_dtype(), lookup_table))]
     
     @staticmethod
-    def b1_map(sources_path, flip_angle, tr_ratio, target_path):
+    def b1_map(
+            sources_path, flip_angle, tr_ratio, target_path, dtype="float64",
+            lookup_table=None):
+        """ Compute the relative B1 map. If specified, lookup_table contains
+            the repetition time, the phase increment and the T1 range of the
+            simulated lookup table.
+        """
+        
         images = [load(x) for x in sources_path]
-        data = [x.get_fdata() for x in images]
+        data = [x.get_fdata(dtype=dtype) for x in images]
         
         with numpy.errstate(divide="ignore", invalid="ignore"):
             r = data[1] / data[0]
         n = tr_ratio
-        actual_fa = numpy.arccos((r*n - 1)/(n-r))
+        if lookup_table is None:
+            actual_fa = numpy.arccos((r*n - 1)/(n-r))
+        else:
+            table = AFI.get_lookup_table(tr_ratio, *lookup_table)
+            # The ratio is decreasing with the flip angle
+            actual_fa = numpy.interp(
+                    r, table["ratio"][::-1], table["flip_angle"][::-1],
+                    numpy.nan, numpy.nan
+                ).astype(dtype, copy=False)
         
-        nibabel.save(
+        save(
             nibabel.Nifti1Image(actual_fa/flip_angle, images[0].affine), 
             target_path)
+    
+    @staticmethod
+    @functools.lru_cache()
+    def get_lookup_table(
+            tr_ratio, repetition_time, phase_increment, T1_range, T2=50e-3):
+        """ Return the ratio of the signals of the second and first TR 
+            ("ratio"), tabulated on a grid of actual flip angles (rad,
+            "flip_angle") where it is decreasing. The ratio is averaged over
+            the T1 range. The table only depends on the protocol: it is shared
+            by all tasks of the same process, and cached on disk for the other
+            processes.
+        """
+        
+        def compute():
+            logging.info("Simulating the AFI lookup table")
+            flip_angle = numpy.radians(numpy.arange(0, 121, 1.))
+            T1 = numpy.linspace(*T1_range, 5)
+            S1, S2 = epg.simulate_afi(
+                T1[:, None], T2, flip_angle, phase_increment, repetition_time,
+                tr_ratio, 600, 200)
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                ratio = numpy.mean(S2/S1, axis=0)
+            # Limit at 0°
+            ratio[0] = 1
+            
+            # Keep the decreasing part of the ratio
+            end = 1+numpy.argmax(numpy.diff(ratio) >= 0)
+            if numpy.all(numpy.diff(ratio) < 0):
+                end = len(ratio)
+            return {"flip_angle": flip_angle[:end], "ratio": ratio[:end]}
         
+        return cache.cached_arrays(
+            "afi_lookup_table",
+            {
+                "tr_ratio": float(tr_ratio), 
+                "repetition_time": float(repetition_time),
+                "phase_increment": float(phase_increment), 
+                "T1_range": [float(x) for x in T1_range], "T2": float(T2)},
+            compute)
+
 def main():
-    return entrypoint(AFI)
+    return entrypoint(AFI, {"repetition_time": "tr", "T1_range": "t1_range"})
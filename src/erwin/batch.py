@@ -0,0 +1,145 @@
+import argparse
+import csv
+import importlib
+import json
+import logging
+import os
+import shlex
+import sys
+
+from . import get_parser, precision, registry, run, runner
+
+def main(arguments):
+    """ Run a method on all the argument sets of a manifest.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="{} batch".format(os.path.basename(sys.argv[0])),
+        description=(
+            "Run a method on all the rows of a manifest, in a single process. "
+            "The manifest is either a CSV file whose header contains the "
+            "argument names, or a JSON file containing a list of objects "
+            "mapping argument names to their values. Multiple values of an "
+            "argument are separated by spaces in a CSV file, and values "
+            "containing spaces are quoted as in a shell. Flags are given as "
+            "true/false or yes/no."))
+    parser.add_argument("method", help="Name of the method, e.g. t1_map.vfa")
+    parser.add_argument("manifest", help="Path to the manifest")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1,
+        help="Number of concurrent processes (defaults to 1)")
+    parser.add_argument(
+        "--verbosity", "-v", default="warning",
+        choices=["debug", "info", "warning", "error", "critical"],
+        help="Set the verbosity level (defaults to \"warning\")")
+    parser.add_argument(
+        "--trace", metavar="PATH",
+        help="Record the time, memory and I/O of each row in a trace file")
+    arguments = parser.parse_args(arguments)
+
+    logging.getLogger().setLevel(
+        getattr(logging, arguments.verbosity.upper()))
+
+    try:
+        tasks = get_tasks(arguments.method, read_manifest(arguments.manifest))
+    except Exception as e:
+        if logging.getLogger().getEffectiveLevel() > logging.DEBUG:
+            parser.error(e)
+        else:
+            raise
+
+    statuses = run(
+        tasks, arguments.jobs, keep_going=True, trace=arguments.trace)
+    failed = [
+        runner.get_name(task) for task, status in zip(tasks, statuses)
+        if status != runner.DONE]
+    if failed:
+        print(
+            "{} of {} rows failed: {}".format(
+                len(failed), len(tasks), ", ".join(failed)),
+            file=sys.stderr)
+
+    return 1 if failed else 0
+
+def get_tasks(method, rows):
+    """ Return the tasks of a method (e.g. "t1_map.vfa") created from rows of
+        arguments.
+    """
+
+    class_, aliases = get_class(method)
+    parser = get_parser(class_, aliases)
+
+    # NOTE: report the errors as exceptions instead of exiting
+    def error(message):
+        raise Exception(message)
+    parser.error = error
+
+    tasks = []
+    for index, row in enumerate(rows):
+        try:
+            arguments = vars(parser.parse_args(to_command_line(row, parser)))
+        except Exception as e:
+            raise Exception("Row {}: {}".format(1+index, e))
+        del arguments["verbosity"]
+        del arguments["trace"]
+        with precision.using(arguments.pop("precision")):
+            tasks.append(class_(**arguments))
+    return tasks
+
+def get_class(method):
+    """ Return the task class of a method and the aliases of its arguments.
+    """
+
+    method = method.strip(".")
+    entrypoint = registry.get_entrypoint(method)
+    if entrypoint is None:
+        raise Exception("No such method: {}".format(method))
+    class_name, aliases = entrypoint
+
+    module = importlib.import_module("{}.{}".format(__package__, method))
+    return getattr(module, class_name), aliases
+
+def read_manifest(path):
+    """ Return the rows of a CSV or JSON manifest, as dictionaries.
+    """
+
+    with open(path, newline="") as fd:
+        if str(path).endswith(".json"):
+            rows = json.load(fd)
+            if not isinstance(rows, list):
+                raise Exception("JSON manifest must be a list of objects")
+        else:
+            rows = [
+                {
+                    name: shlex.split(value)
+                    for name, value in row.items() if (value or "").strip()}
+                for row in csv.DictReader(fd, skipinitialspace=True)]
+    return rows
+
+def to_command_line(row, parser):
+    """ Convert a row of a manifest to command-line arguments of a parser. The
+        values of the flags are booleans, or their string representations.
+    """
+
+    booleans = {
+        "true": True, "True": True, "yes": True,
+        "false": False, "False": False, "no": False}
+
+    command_line = []
+    for name, value in row.items():
+        option = "--{}".format(name.strip().lstrip("-").replace("_", "-"))
+        values = value if isinstance(value, list) else [value]
+        values = [x for x in values if x is not None]
+        action = parser._option_string_actions.get(option)
+        if action is not None and action.nargs == 0:
+            # Flag, either store_true or store_false: the option is only
+            # given if it sets the requested value
+            if len(values) != 1 or str(values[0]) not in booleans:
+                raise Exception(
+                    "Invalid value for {}: {}".format(option, value))
+            if booleans[str(values[0])] == action.const:
+                command_line.append(option)
+        elif values:
+            command_line.append(option)
+            command_line.extend(str(x) for x in values)
+    return command_line
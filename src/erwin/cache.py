@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+
+def get_directory():
+    """ Return the directory of the persistent cache, defined by the
+        ERWIN_CACHE environment variable, and defaulting to the "erwin"
+        directory of the user cache directory.
+    """
+
+    directory = os.environ.get("ERWIN_CACHE")
+    if not directory:
+        directory = os.path.join(
+            os.environ.get("XDG_CACHE_HOME")
+                or os.path.join(os.path.expanduser("~"), ".cache"),
+            "erwin")
+    return directory
+
+def get_path(category, key, extension):
+    """ Return the path to the cache entry of a given category, identified by
+        a key. The key must have a stable textual representation (e.g.
+        numbers, strings, and lists or dictionaries of those).
+    """
+
+    digest = hashlib.sha1(
+        json.dumps(key, sort_keys=True, default=repr).encode()).hexdigest()
+    return os.path.join(
+        get_directory(), category, "{}.{}".format(digest, extension))
+
+def load_json(category, key):
+    """ Return the JSON cache entry, or None if it does not exist.
+    """
+
+    path = get_path(category, key, "json")
+    try:
+        with open(path) as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        return None
+
+def save_json(category, key, value):
+    """ Store a JSON cache entry. Failures to write the cache are logged and
+        otherwise ignored.
+    """
+
+    path = get_path(category, key, "json")
+    with _atomic_write(path, "w") as fd:
+        if fd is not None:
+            json.dump(value, fd)
+
+def load_arrays(category, key):
+    """ Return the array cache entry as a dictionary, or None if it does not
+        exist.
+    """
+
+    import numpy
+
+    path = get_path(category, key, "npz")
+    try:
+        with numpy.load(path) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError):
+        return None
+
+def save_arrays(category, key, arrays):
+    """ Store a dictionary of arrays as a cache entry. Failures to write the
+        cache are logged and otherwise ignored.
+    """
+
+    import numpy
+
+    path = get_path(category, key, "npz")
+    with _atomic_write(path, "wb") as fd:
+        if fd is not None:
+            numpy.savez(fd, **arrays)
+
+def cached_arrays(category, key, function):
+    """ Return the dictionary of arrays computed by function, from the cache
+        if possible.
+    """
+
+    arrays = load_arrays(category, key)
+    if arrays is None:
+        arrays = function()
+        save_arrays(category, key, arrays)
+    return arrays
+
+class _atomic_write(object):
+    """ Context manager opening a temporary file which is renamed to path on
+        exit, so that concurrent readers never see a partial entry. The file
+        object is None if the cache is not writable.
+    """
+
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        self.temporary_path = "{}.{}.tmp".format(path, os.getpid())
+        self.fd = None
+
+    def __enter__(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.fd = open(self.temporary_path, self.mode)
+        except OSError as e:
+            logging.info("Cannot write to cache: {}".format(e))
+        return self.fd
+
+    def __exit__(self, type_, value, traceback):
+        if self.fd is None:
+            return
+        self.fd.close()
+        try:
+            if type_ is None:
+                os.replace(self.temporary_path, self.path)
+            else:
+                os.remove(self.temporary_path)
+        except OSError as e:
+            logging.info("Cannot write to cache: {}".format(e))
+
+        if type_ is not None and issubclass(type_, OSError):
+            logging.info("Cannot write to cache: {}".format(value))
+            return True
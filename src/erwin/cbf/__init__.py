@@ -1,5 +1,9 @@
 """ Cerebral blood flow
 """
 
-from .asl_bold_to_asl import ASLBOLDToASL
-from .pasl import pASL
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "ASLBOLDToASL": "asl_bold_to_asl",
+        "pASL": "pasl"})
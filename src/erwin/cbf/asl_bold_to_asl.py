@@ -2,7 +2,7 @@ import nibabel
 import numpy
 import spire
 
-from .. import entrypoint
+from .. import entrypoint, load, save
 from ..cli import *
 
 class ASLBOLDToASL(spire.TaskFactory):
@@ -36,7 +36,7 @@ class ASLBOLDToASL(spire.TaskFactory):
                 (source, repetition_time, cutoff_frequency, target))]
     
     def filter(source_path, repetition_time, cutoff_frequency, target_path):
-        source = nibabel.load(source_path)
+        source = load(source_path)
         
         # Build the frequencies array and the stop-band based on the TR
         # NOTE: the first volume does not have the inversion pulses and must not
@@ -53,7 +53,7 @@ class ASLBOLDToASL(spire.TaskFactory):
 
         target_array = source.get_fdata().copy()
         target_array[..., 1:] = numpy.fft.ifft(source_fft, axis=-1).real
-        nibabel.save(
+        save(
             nibabel.Nifti1Image(target_array, source.affine), target_path)
 
 def main():
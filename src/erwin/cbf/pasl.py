@@ -2,7 +2,7 @@ import nibabel
 import numpy
 import spire
 
-from .. import entrypoint
+from .. import entrypoint, load, precision, save
 from ..cli import *
 
 class pASL(spire.TaskFactory):
@@ -36,13 +36,15 @@ class pASL(spire.TaskFactory):
         self.actions = [
             (
                 pASL.get_cbf,
-                (source, echo_time, inversion_times, slice_time, target))]
+                (
+                    source, echo_time, inversion_times, slice_time, target,
+                    precision.get_dtype()))]
     
     def get_cbf(
             source_path, echo_time, inversion_times, slice_time_path,
-            target_path):
-        source = nibabel.load(source_path)
-        slice_time = nibabel.load(slice_time_path)
+            target_path, dtype="float64"):
+        source = load(source_path)
+        slice_time = load(slice_time_path)
         
         # Blood/tissue water partition coefficient, in L/kg
         # - 0.9 mL/g in Wang et al. and Foucher et al. (global)
@@ -68,21 +70,22 @@ class pASL(spire.TaskFactory):
         # Time between inversion and image acquisition of *first* slice
         TI_2 = inversion_times[1]
         # Convert TI_2 to real slice acquistion time
-        TI_2 = TI_2 + slice_time.get_fdata()
+        TI_2 = TI_2 + slice_time.get_fdata(dtype=dtype)
         # WARNING: slice timing may vary across volumes. Average the 
         # corresponding tagged/untagged volumes.
         TI_2 = 0.5*(TI_2[..., 1::2]+TI_2[..., 2::2])
 
-        M0 = source.get_fdata()[...,0]
+        data = source.get_fdata(dtype=dtype)
+        M0 = data[...,0]
         # WARNING: the tagged/control alternance is hard-coded.
-        delta_M = source.get_fdata()[..., 2::2] - source.get_fdata()[..., 1::2]
+        delta_M = data[..., 2::2] - data[..., 1::2]
         
         with numpy.errstate(divide="ignore", invalid="ignore"):
             # 4D Cerebral Blood Flow in L / kg / s
             CBF = (
               (lambda_ * delta_M)
               / (2*alpha * M0[..., None] * TI_1 * numpy.exp(-TI_2 / T1_a)) 
-              * numpy.exp(delta_R2_star * echo_time))
+              * float(numpy.exp(delta_R2_star * echo_time)))
             
             # Average all volumes
             CBF = numpy.nanmean(CBF, axis=-1)
@@ -94,7 +97,7 @@ class pASL(spire.TaskFactory):
         CBF[CBF < -1000] = -1000
         CBF[CBF > +1000] = +1000
         
-        nibabel.save(nibabel.Nifti1Image(CBF, source.affine), str(target_path))
+        save(nibabel.Nifti1Image(CBF, source.affine), str(target_path))
 
 def main():
     return entrypoint(pASL, {"echo_time": "te", "inversion_times": "ti"})
@@ -1,12 +1,10 @@
 import inspect
+import os
 import re
+import sys
 import typing
 
-import docutils.frontend
-import docutils.nodes
-import docutils.parsers.rst
-import docutils.utils
-import sphinx.util.typing
+from . import cache
 
 class Choice(object):
     """ Type hint corresponding to an enumeration
@@ -32,14 +30,19 @@ class Flag(object):
     """
     pass
 
+# NOTE: the stringification of the type hints is only used when building the
+# documentation, in which case Sphinx is already imported. Skip it otherwise
+# to reduce the start-up time.
 original_stringify = None
-try:
-    original_stringify = sphinx.util.typing.stringify_annotation
-except AttributeError:
+if "sphinx" in sys.modules:
+    import sphinx.util.typing
     try:
-        original_stringify = sphinx.util.typing.stringify
+        original_stringify = sphinx.util.typing.stringify_annotation
     except AttributeError:
-        pass
+        try:
+            original_stringify = sphinx.util.typing.stringify
+        except AttributeError:
+            pass
 if original_stringify is not None:
     def stringify(annotation: typing.Any) -> str:
         if isinstance(annotation, Choice):
@@ -56,6 +59,35 @@ def get_arguments(class_):
     """ Using the class docstring, and the type hints and docstring of the class
         __init__, return a list of (name, options) to pass to 
         ArgumentParser.add_argument
+        
+        The arguments are cached until the module of the class changes, so
+        that the docstring is not parsed on each call.
+    """
+    
+    key = get_cache_key(class_)
+    arguments = cache.load_json("arguments", key)
+    if arguments is not None:
+        return [
+            [name, {k: load_option(k, v) for k, v in options.items()}]
+            for name, options in arguments]
+    
+    arguments = build_arguments(class_)
+    
+    try:
+        serialized = [
+            [name, {k: dump_option(k, v) for k, v in options.items()}]
+            for name, options in arguments]
+    except ValueError:
+        # Arguments which cannot be stored in the cache
+        pass
+    else:
+        cache.save_json("arguments", key, serialized)
+    
+    return arguments
+
+def build_arguments(class_):
+    """ Return the list of (name, options) to pass to 
+        ArgumentParser.add_argument, see get_arguments.
     """
     arguments = []
     
@@ -77,6 +109,45 @@ def get_arguments(class_):
     
     return arguments
 
+def get_cache_key(class_):
+    """ Return the key of the cached arguments of a class.
+    """
+    
+    return {
+        "class": "{}.{}".format(class_.__module__, class_.__qualname__),
+        "module": os.stat(sys.modules[class_.__module__].__file__).st_mtime_ns,
+        # Invalidate the cache if the conversion to arguments changes
+        "cli": os.stat(__file__).st_mtime_ns}
+
+# Types which can be stored in the cache of arguments
+cached_types = {x.__name__: x for x in [bool, float, int, str]}
+
+def dump_option(name, value):
+    """ Convert an argparse option to a JSON-compatible value.
+    """
+    
+    if name == "type":
+        if cached_types.get(getattr(value, "__name__", None)) is not value:
+            raise ValueError("Cannot store type {}".format(value))
+        return value.__name__
+    elif isinstance(value, tuple):
+        return {"tuple": [dump_option(None, x) for x in value]}
+    elif value is None or isinstance(value, (bool, float, int, str)):
+        return value
+    else:
+        raise ValueError("Cannot store value {}".format(value))
+
+def load_option(name, value):
+    """ Convert a JSON-compatible value to an argparse option.
+    """
+    
+    if name == "type":
+        return cached_types[value]
+    elif isinstance(value, dict) and "tuple" in value:
+        return tuple(value["tuple"])
+    else:
+        return value
+
 def get_argument(name, type_, args, default, help):
     """ Return a pair of (name, options) to pass to ArgumentParser.add_argument
         
@@ -131,6 +202,31 @@ def get_param_fields(class_):
     """ Return the `param` fields of a RST document.
     """
     
+    # NOTE: docutils is only imported when needed to reduce the start-up time.
+    import docutils.frontend
+    import docutils.nodes
+    import docutils.parsers.rst
+    import docutils.utils
+    
+    class GetParamFields(docutils.nodes.NodeVisitor):
+        """ Return the `param` fields of a RST document.
+        """
+        def __init__(self, *args, **kwargs):
+            docutils.nodes.NodeVisitor.__init__(self, *args, **kwargs)
+            self.fields = {}
+        
+        def visit_field(self, field):
+            field_name, field_body = field.children
+            field_type, field_data = field_name.children[0].astext().split(" ", 1)
+            
+            if field_type != "param":
+                return
+            
+            self.fields[field_data] = field_body.astext()
+        
+        def unknown_visit(self, node):
+            pass
+    
     settings = docutils.frontend.OptionParser(
             components=(docutils.parsers.rst.Parser,)
         ).get_default_values()
@@ -147,24 +243,5 @@ def get_param_fields(class_):
     
     return visitor.fields
 
-class GetParamFields(docutils.nodes.NodeVisitor):
-    """ Return the `param` fields of a RST document.
-    """
-    def __init__(self, *args, **kwargs):
-        docutils.nodes.NodeVisitor.__init__(self, *args, **kwargs)
-        self.fields = {}
-    
-    def visit_field(self, field):
-        field_name, field_body = field.children
-        field_type, field_data = field_name.children[0].astext().split(" ", 1)
-        
-        if field_type != "param":
-            return
-        
-        self.fields[field_data] = field_body.astext()
-    
-    def unknown_visit(self, node):
-        pass
-
 # Easy access to main type hints
 from typing import Optional, Tuple
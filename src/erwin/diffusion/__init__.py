@@ -1,19 +1,24 @@
 """ Diffusion (tensor, spherical harmonics, NODDI, etc.)
 """
 
-from .b_zero import BZero
-from .bruker_to_mif import BrukerToMIF
-from .fod_segmentation import FODSegmentation
-from .mask import Mask
-from .mean_response import MeanResponse
-from .multi_tissue_normalization import MultiTissueNormalization
-from .noddi import NODDI
-from .noddi_responses import NODDIResponses
-from .preprocessing import Preprocessing
-from .siemens_to_mif import SiemensToMIF
-from .sift2 import SIFT2
-from .spherical_deconvolution_response import SphericalDeconvolutionResponse
-from .spherical_harmonics import SphericalHarmonics
-from .tensor import Tensor
-from .tensor_metric import TensorMetric
-from .tractography import Tractography
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "BZero": "b_zero",
+        "BrukerToMIF": "bruker_to_mif",
+        "FODSegmentation": "fod_segmentation",
+        "Mask": "mask",
+        "MeanResponse": "mean_response",
+        "MultiTissueNormalization": "multi_tissue_normalization",
+        "NODDI": "noddi",
+        "NODDIResponses": "noddi_responses",
+        "Preprocessing": "preprocessing",
+        "SiemensToMIF": "siemens_to_mif",
+        "SIFT2": "sift2",
+        "SphericalDeconvolutionResponse": "spherical_deconvolution_response",
+        "SphericalHarmonics": "spherical_harmonics",
+        "Tensor": "tensor",
+        "TensorMetric": "tensor_metric",
+        "Tractography": "tractography",
+        "mif_io": "mif_io"})
@@ -10,6 +10,9 @@ import nibabel
 import numpy
 import spire
 
+from .. import entrypoint
+from ..cli import *
+
 class BrukerToMIF(spire.TaskFactory):
     """ Convert DWI data from Bruker to MIF format.
     """
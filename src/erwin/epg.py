@@ -0,0 +1,208 @@
+import numpy
+
+def simulate_spgr(
+        T1, T2, flip_angle, phase_step_increment, TE, TR, repetitions=500,
+        tolerance=None, window=36):
+    """ Extended phase graph simulation of an RF-spoiled gradient echo
+        sequence, for all combinations of parameters at once. The RF phase of
+        the n-th pulse is phase_step_increment⋅n⋅(n+1)/2, and the readout
+        gradient dephases the magnetization by one order in each TR.
+
+        The parameters (T1, T2, TE and TR in s, angles in rad) are broadcast
+        together. Return the magnitude of the last echo, with the same shape
+        as the broadcast parameters.
+
+        If tolerance is given, the simulation stops before the number of
+        repetitions when all echoes are within tolerance (relative) of their
+        steady state. The distance to the steady state is extrapolated from
+        the changes of the echoes over two successive windows of repetitions.
+    """
+
+    parameters = numpy.broadcast_arrays(
+        *[
+            numpy.asarray(x, float)
+            for x in [T1, T2, flip_angle, phase_step_increment, TE, TR]])
+    shape = parameters[0].shape
+    T1, T2, flip_angle, phase_step_increment, TE, TR = [
+        x.reshape(-1, 1) for x in parameters]
+
+    states = _get_states(len(T1), _get_max_orders(T2, TR, repetitions+1))
+    rotation = _get_rotation(flip_angle)
+
+    # Relaxation terms before and after the echo
+    relaxations = [
+        (numpy.exp(-duration/T1), numpy.exp(-duration/T2))
+        for duration in [TE, TR-TE]]
+
+    echo, history = None, []
+    orders = 1
+    for repetition in range(repetitions):
+        _apply_pulse(
+            states, orders, rotation,
+            phase_step_increment * repetition*(repetition+1)/2)
+
+        _relax(states, orders, *relaxations[0])
+        echo = numpy.abs(states[0][:, 0])
+        _relax(states, orders, *relaxations[1])
+
+        # Dephasing by the readout gradient
+        orders = _dephase(states, orders)
+
+        if tolerance is not None:
+            history.append(echo)
+            if _is_steady(history, window, tolerance):
+                break
+
+    return echo.reshape(shape)
+
+def simulate_afi(
+        T1, T2, flip_angle, phase_step_increment, TR, tr_ratio,
+        repetitions=500, averages=1):
+    """ Extended phase graph simulation of an actual flip-angle imaging (AFI)
+        sequence, i.e. of an RF-spoiled gradient echo with two alternating
+        repetition times TR and tr_ratio⋅TR, for all combinations of
+        parameters at once. The RF phase of the n-th pulse is
+        phase_step_increment⋅n⋅(n+1)/2, and the spoiler gradients dephase the
+        magnetization by one order in the first TR and by round(tr_ratio)
+        orders in the second one.
+
+        The parameters (T1, T2 and TR in s, angles in rad) are broadcast
+        together. Return the magnitude of the signals just after the pulses
+        of the first and of the second TR, with the same shape as the
+        broadcast parameters. The signals are averaged over the last pairs of
+        repetitions: with imperfect spoiling, they oscillate around their
+        steady state.
+
+        Reference: On the steady-state properties of actual flip angle imaging
+        (AFI). Nehrke. Magnetic Resonance in Medicine 61(1). 2009.
+    """
+
+    parameters = numpy.broadcast_arrays(
+        *[
+            numpy.asarray(x, float)
+            for x in [T1, T2, flip_angle, phase_step_increment, TR]])
+    shape = parameters[0].shape
+    T1, T2, flip_angle, phase_step_increment, TR = [
+        x.reshape(-1, 1) for x in parameters]
+
+    dephasings = [1, max(1, int(round(tr_ratio)))]
+    states = _get_states(
+        len(T1), _get_max_orders(T2, TR, 1+sum(dephasings)*repetitions))
+    rotation = _get_rotation(flip_angle)
+    relaxations = [
+        (numpy.exp(-duration/T1), numpy.exp(-duration/T2))
+        for duration in [TR, tr_ratio*TR]]
+
+    signals = [0, 0]
+    orders, pulse = 1, 0
+    for repetition in range(repetitions):
+        for index, ((E1, E2), dephasing) in enumerate(
+                zip(relaxations, dephasings)):
+            _apply_pulse(
+                states, orders, rotation,
+                phase_step_increment * pulse*(pulse+1)/2)
+            pulse += 1
+            if repetition >= repetitions-averages:
+                signals[index] = signals[index] + numpy.abs(states[0][:, 0])
+
+            _relax(states, orders, E1, E2)
+            orders = _dephase(states, orders, dephasing)
+
+    return tuple((x/averages).reshape(shape) for x in signals)
+
+def _get_max_orders(T2, TR, max_orders):
+    """ Return the number of configuration states to simulate. A state of
+        order k has been dephased k times in the transverse plane, and is thus
+        attenuated by at least exp(-k⋅TR/T2): the orders where this
+        attenuation is below 1e-12 are discarded.
+    """
+
+    return min(
+        max_orders, 1+int(numpy.ceil(numpy.max(-numpy.log(1e-12)*T2/TR))))
+
+def _get_states(count, max_orders):
+    """ Return the configuration states F+(k), F-(k) and Z(k) for k ≥ 0, one
+        row per combination of parameters, at equilibrium.
+    """
+
+    F_plus, F_minus, Z = [
+        numpy.zeros((count, max_orders), complex) for _ in range(3)]
+    Z[:, 0] = 1
+    return F_plus, F_minus, Z
+
+def _get_rotation(flip_angle):
+    """ Return the rotation terms of a pulse.
+    """
+
+    return (
+        numpy.cos(flip_angle/2)**2, numpy.sin(flip_angle/2)**2,
+        numpy.sin(flip_angle), numpy.cos(flip_angle))
+
+def _apply_pulse(states, orders, rotation, phase):
+    """ Apply a pulse to the populated orders of the states, in-place.
+    """
+
+    F_plus, F_minus, Z = [x[:, :orders] for x in states]
+    cos_2, sin_2, sin, cos = rotation
+    phase = numpy.exp(1j*phase)
+    states[0][:, :orders], states[1][:, :orders], states[2][:, :orders] = (
+        cos_2*F_plus + phase**2*sin_2*F_minus - 1j*phase*sin*Z,
+        phase.conj()**2*sin_2*F_plus + cos_2*F_minus
+            + 1j*phase.conj()*sin*Z,
+        -0.5j*phase.conj()*sin*F_plus + 0.5j*phase*sin*F_minus + cos*Z)
+
+def _relax(states, orders, E1, E2):
+    """ Apply the relaxation to the populated orders of the states, in-place.
+    """
+
+    F_plus, F_minus, Z = states
+    F_plus[:, :orders] *= E2
+    F_minus[:, :orders] *= E2
+    Z[:, :orders] *= E1
+    Z[:, :1] += 1-E1
+
+def _dephase(states, orders, count=1):
+    """ Dephase the states by count orders, in-place, and return the number
+        of populated orders.
+    """
+
+    F_plus, F_minus, Z = states
+    max_orders = F_plus.shape[1]
+    new_orders = min(orders+count, max_orders)
+    F_plus_, F_minus_ = F_plus[:, :orders].copy(), F_minus[:, :orders].copy()
+
+    # F+(k) becomes F+(k+count), F-(k) becomes F-(k-count), and F-(k) for
+    # 0 < k ≤ count becomes F+(count-k) by conjugation
+    F_plus[:, count:new_orders] = F_plus_[:, :new_orders-count]
+    F_plus[:, :count] = 0
+    refocused = min(count, orders-1)
+    F_plus[:, count-refocused:count] = F_minus_[:, refocused:0:-1].conj()
+    F_minus[:, :orders] = 0
+    F_minus[:, :max(0, orders-count)] = F_minus_[:, count:]
+
+    return new_orders
+
+def _is_steady(history, window, tolerance):
+    """ Test whether the last signals of the history are within tolerance
+        (relative) of their steady state. The oldest signals which are not
+        needed anymore are removed from the history.
+    """
+
+    if len(history) <= 2*window:
+        return False
+
+    # Assuming a geometric convergence of the signal, the distance to the
+    # steady state is change⋅rate/(1-rate). The changes are computed over a
+    # window of repetitions to smooth the oscillations caused by the spoiling.
+    # Changes far below the tolerance are accepted whatever their rate, since
+    # neither the rounding errors nor the residual oscillations caused by the
+    # spoiling decrease.
+    change = numpy.abs(history[-1]-history[-1-window])
+    previous_change = numpy.abs(history[-1-window]-history[-1-2*window])
+    del history[0]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        rate = change/previous_change
+        distance = change*rate/(1-rate)
+    return numpy.all(
+        (change <= 1e-3*tolerance*history[-1])
+        | ((rate < 1) & (distance <= tolerance*history[-1])))
@@ -0,0 +1,123 @@
+import collections
+import contextlib
+import os
+
+class ImageCache(object):
+    """ In-memory LRU cache of images, indexed by path. An entry is only valid
+        as long as the file on disk has the same modification time and size
+        as when it was cached.
+    """
+
+    def __init__(self, max_size):
+        """ :param max_size: Maximum size of the cached arrays (bytes)
+        """
+
+        self.max_size = max_size
+        self.size = 0
+        self._images = collections.OrderedDict()
+
+    def get(self, path):
+        """ Return a copy of the cached image, or None if the image is not
+            cached or has been modified.
+        """
+
+        path = os.path.abspath(str(path))
+        entry = self._images.get(path)
+        if entry is None:
+            return None
+
+        key, array, affine, header = entry
+        if key != get_key(path):
+            self._remove(path)
+            return None
+
+        import nibabel
+
+        self._images.move_to_end(path)
+        # NOTE: the tasks may modify the array in-place
+        return nibabel.Nifti1Image(array.copy(), affine, header.copy())
+
+    def put(self, path, image):
+        """ Cache an image which has just been saved to path.
+        """
+
+        import nibabel
+
+        path = os.path.abspath(str(path))
+        if path in self._images:
+            self._remove(path)
+
+        array = image.dataobj
+        if (
+                not isinstance(image, nibabel.Nifti1Image)
+                or not hasattr(array, "nbytes")
+                or array.dtype != image.get_data_dtype()
+                or array.nbytes > self.max_size):
+            # Only store the images whose on-disk data matches the array.
+            return
+
+        self._images[path] = (
+            get_key(path), array.copy(), image.affine, image.header.copy())
+        self.size += array.nbytes
+
+        while self.size > self.max_size:
+            self._remove(next(iter(self._images)))
+
+    def clear(self):
+        """ Remove all cached images.
+        """
+
+        self._images.clear()
+        self.size = 0
+
+    def _remove(self, path):
+        _, array, _, _ = self._images.pop(path)
+        self.size -= array.nbytes
+
+_cache = None
+
+def get_cache():
+    """ Return the active image cache, or None.
+    """
+
+    return _cache
+
+def set_cache(cache):
+    """ Set the active image cache (None to disable caching), return the
+        previous one.
+    """
+
+    global _cache
+
+    previous = _cache
+    _cache = cache
+    return previous
+
+@contextlib.contextmanager
+def enabled(max_size):
+    """ Enable an image cache while in the context.
+
+        :param max_size: Maximum size of the cached arrays (bytes)
+    """
+
+    cache = ImageCache(max_size)
+    previous = set_cache(cache)
+    try:
+        yield cache
+    finally:
+        set_cache(previous)
+
+def enable(max_size):
+    """ Enable an image cache for the rest of the process.
+
+        :param max_size: Maximum size of the cached arrays (bytes)
+    """
+
+    set_cache(ImageCache(max_size))
+
+def get_key(path):
+    """ Return the modification time and size of a file.
+    """
+
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
@@ -1,5 +1,9 @@
 """ Access to meta-data
 """
 
-from . import get
-from .get import get_meta_data
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "get_meta_data": "get",
+        "get": "get"})
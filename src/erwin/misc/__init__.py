@@ -1,4 +1,9 @@
 """ Uncategorized methods
 """
 
-from .time_to_rate import TimeToRate
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "PhaseUnwrapping": "phase_unwrapping",
+        "TimeToRate": "time_to_rate"})
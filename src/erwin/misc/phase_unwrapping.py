@@ -0,0 +1,128 @@
+import functools
+
+import nibabel
+import numpy
+import spire
+
+from .. import entrypoint, get_path, load, precision, save
+from ..cli import *
+
+class PhaseUnwrapping(spire.TaskFactory):
+    """ Unwrap a phase image using the Laplacian method.
+        
+        The unwrapped phase is ∇⁻²[cos(φ)∇²sin(φ) - sin(φ)∇²cos(φ)], where the
+        Laplacian and its inverse are computed using discrete cosine
+        transforms (i.e. with Neumann boundary conditions). The result is then
+        made congruent with the wrapped phase, i.e. it differs from it by
+        multiples of 2π.
+        
+        Reference: Fast phase unwrapping algorithm for interferometric
+        applications. Schofield & Zhu. Optics Letters 28(14). 2003.
+    """
+    
+    def __init__(self, source: str, target: str, threads: Optional[int]=None):
+        """ :param source: Path to source wrapped phase image (rad)
+            :param target: Path to target unwrapped phase image (rad)
+            :param threads: Number of threads of the transforms, defaults to all CPUs
+        """
+        
+        spire.TaskFactory.__init__(self, str(target))
+        
+        self.file_dep = [get_path(source)]
+        self.targets = [target]
+        self.actions = [
+            (
+                PhaseUnwrapping.unwrap_image,
+                (source, target, threads, precision.get_dtype()))]
+    
+    @staticmethod
+    def unwrap_image(source_path, target_path, threads=None, dtype="float64"):
+        source = load(source_path)
+        phase = source.get_fdata(dtype=dtype)
+        voxel_size = source.header.get_zooms()[:3]
+        
+        # Unwrap each volume of a time series
+        for index in numpy.ndindex(phase.shape[3:]):
+            phase[(..., *index)] = PhaseUnwrapping.unwrap(
+                phase[(..., *index)], voxel_size, threads)
+        
+        save(nibabel.Nifti1Image(phase, source.affine), target_path)
+    
+    @staticmethod
+    def unwrap(phase, voxel_size=None, threads=None):
+        """ Return the unwrapped phase of a 3D array.
+            
+            :param phase: wrapped phase (rad)
+            :param voxel_size: size of the voxels along each axis, defaults to
+                isotropic
+            :param threads: number of threads of the transforms, defaults to
+                all CPUs
+        """
+        
+        import scipy.fft
+        
+        workers = threads or -1
+        dtype = numpy.result_type(phase, numpy.float32)
+        phase = numpy.asarray(phase, dtype)
+        if voxel_size is None:
+            voxel_size = [1]*phase.ndim
+        kernel = get_kernel(
+            phase.shape, tuple(float(x) for x in voxel_size), dtype.name)
+        
+        def laplacian(array):
+            transform = scipy.fft.dctn(array, 2, workers=workers)
+            transform *= kernel
+            return scipy.fft.idctn(transform, 2, workers=workers)
+        
+        sin, cos = numpy.sin(phase), numpy.cos(phase)
+        laplacian_phase = cos*laplacian(sin)
+        laplacian_phase -= sin*laplacian(cos)
+        del sin, cos
+        
+        # Inverse Laplacian. The constant term is undefined, and set to the
+        # mean of the wrapped phase.
+        transform = scipy.fft.dctn(laplacian_phase, 2, workers=workers)
+        del laplacian_phase
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            transform /= kernel
+        transform.flat[0] = 0
+        unwrapped = scipy.fft.idctn(transform, 2, workers=workers)
+        del transform
+        unwrapped += phase.mean()
+        
+        # Congruence with the wrapped phase
+        unwrapped -= phase
+        unwrapped /= 2*numpy.pi
+        numpy.round(unwrapped, out=unwrapped)
+        unwrapped *= 2*numpy.pi
+        unwrapped += phase
+        
+        return unwrapped
+
+def get_kernel(shape, voxel_size, dtype):
+    """ Return the discrete Laplacian in the domain of the type-II DCT, for an
+        array shape and a voxel size. Only the eigenvalues along each axis are
+        cached, since the same matrix size is used by all images of a
+        protocol: the kernel itself is as large as the image.
+    """
+    
+    kernel = 0
+    for axis, (size, spacing) in enumerate(zip(shape, voxel_size)):
+        kernel = kernel + get_eigenvalues(size, spacing, dtype).reshape(
+            [-1 if x == axis else 1 for x in range(len(shape))])
+    return kernel
+
+@functools.lru_cache()
+def get_eigenvalues(size, spacing, dtype):
+    """ Return the eigenvalues of the 1D discrete Laplacian in the domain of
+        the type-II DCT.
+    """
+    
+    eigenvalues = (
+        2*(numpy.cos(numpy.pi*numpy.arange(size)/size)-1) / spacing**2
+    ).astype(dtype)
+    eigenvalues.flags.writeable = False
+    return eigenvalues
+
+def main():
+    return entrypoint(PhaseUnwrapping)
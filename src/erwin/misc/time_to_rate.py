@@ -2,7 +2,7 @@ import nibabel
 import numpy
 import spire
 
-from .. import entrypoint
+from .. import entrypoint, load, save
 from ..cli import *
 
 class TimeToRate(spire.TaskFactory):
@@ -24,11 +24,11 @@ class TimeToRate(spire.TaskFactory):
         
     @staticmethod
     def invert(source, range, destination):
-        time_image = nibabel.load(source)
+        time_image = load(source)
         rate_array = 1./time_image.get_fdata()
         if range is not None:
             rate_array = numpy.clip(rate_array, *range)
-        nibabel.save(
+        save(
             nibabel.Nifti1Image(rate_array, time_image.affine), destination)
 
 def main():
@@ -1,5 +1,9 @@
 """ Motion correction
 """
 
-from .ants import Ants
-from .apply_ants import ApplyAnts
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "Ants": "ants",
+        "ApplyAnts": "apply_ants"})
@@ -1,5 +1,9 @@
 """ Magnetization transfer
 """
 
-from .mtr import MTR
-from .single_point import SinglePoint
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "MTR": "mtr",
+        "SinglePoint": "single_point"})
@@ -1,5 +1,10 @@
+import os
+
 import cython
-from libc.math cimport fabs, cos, exp, log, pi, sin
+from cython.parallel import prange
+from libc.math cimport fabs, cos, exp, log, pi, sin, sqrt, INFINITY, NAN
+
+import numpy
 
 @cython.cdivision(True)
 def super_lorentzian_differential(float u, float Delta, float T2b):
@@ -48,3 +53,113 @@ def model(
         f, R1, T2_free, duration, delta_omega, TR, flip_angle, omega_1_rms, G)
     
     return float("nan") if S_ref == 0 else S_ratio - S_mt / S_ref
+
+@cython.cdivision(True)
+cdef double ramani_signal(
+        double f, double R1, double T2_free, double duration, 
+        double delta_omega, double TR, double flip_angle, double omega_1_rms, 
+        double G) noexcept nogil:
+    """ Double-precision version of newRamani_corr, also defined for f=0. """
+    
+    cdef double R1f = R1
+    cdef double R1b = R1
+    
+    cdef double R = 19. # [s^-1] 
+    cdef double k = R*f/(1.-f)
+    
+    # Time-averaged saturation rate for the free and bound pools
+    cdef double Wf = ( omega_1_rms / (2*pi*delta_omega) )**2 / T2_free
+    cdef double Wb = pi * omega_1_rms**2 * G
+    
+    cdef double beta = -log(cos(flip_angle))/TR
+    cdef double s = duration/TR
+    
+    # NOTE: k/F is equal to R
+    cdef double Y1 = R1b*k/R1f + s*Wb + R1b + R
+    cdef double Y2 = k/R1f*(R1b + s*Wb) + (1. + s*Wf/R1f + beta/R1f)*(s*Wb + R1b + R)
+    
+    cdef double Mzf = (1.-f)*Y1/Y2
+    
+    return Mzf * sin(flip_angle)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def model_batch(
+        double[::1] f, 
+        double[::1] S_ratio, double[::1] R1, double[::1] T2_free, 
+        double[::1] delta_omega, double[::1] omega_1_rms, double[::1] G, 
+        double TR, double duration, double flip_angle, int threads=0):
+    """ Vectorized version of model, on arrays of voxels. The voxels are 
+        processed in parallel by the given number of threads (all CPUs if 0).
+    """
+    
+    cdef Py_ssize_t i, size = f.shape[0]
+    cdef double S_ref, S_mt
+    
+    result = numpy.empty(size)
+    cdef double[::1] result_view = result
+    
+    if threads <= 0:
+        threads = os.cpu_count()
+    
+    for i in prange(size, nogil=True, schedule="static", num_threads=threads):
+        S_ref = ramani_signal(
+            f[i], R1[i], T2_free[i], duration, delta_omega[i], TR, flip_angle, 
+            0, G[i])
+        S_mt = ramani_signal(
+            f[i], R1[i], T2_free[i], duration, delta_omega[i], TR, flip_angle, 
+            omega_1_rms[i], G[i])
+        if S_ref == 0:
+            result_view[i] = NAN
+        else:
+            result_view[i] = S_ratio[i] - S_mt / S_ref
+    
+    return result
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def super_lorentzian_batch(
+        double[::1] frequency_offsets, double T2_bound, int threads=0):
+    """ Super-Lorentzian lineshape at the given frequency offsets (Hz). The 
+        integral is computed by a Gauss-Legendre quadrature on panels refined
+        geometrically towards the magic angle, where the integrand is singular.
+        The offsets are processed in parallel by the given number of threads
+        (all CPUs if 0).
+    """
+    
+    cdef Py_ssize_t i, j, size = frequency_offsets.shape[0]
+    cdef double offset, integral, d
+    
+    # Quadrature nodes and weights
+    magic_angle = 1/numpy.sqrt(3)
+    levels = 0.5**numpy.arange(41)
+    bounds = numpy.concatenate([
+        magic_angle*(1-levels), [magic_angle], 
+        magic_angle + (1-magic_angle)*levels[::-1]])
+    x, w = numpy.polynomial.legendre.leggauss(12)
+    lower, upper = bounds[:-1, None], bounds[1:, None]
+    cdef double[::1] nodes = ((upper-lower)/2*x + (upper+lower)/2).ravel()
+    cdef double[::1] weights = ((upper-lower)/2*w).ravel()
+    cdef Py_ssize_t nodes_count = nodes.shape[0]
+    
+    result = numpy.empty(size)
+    cdef double[::1] result_view = result
+    
+    if threads <= 0:
+        threads = os.cpu_count()
+    
+    for i in prange(size, nogil=True, schedule="static", num_threads=threads):
+        offset = fabs(frequency_offsets[i])
+        if offset == 0:
+            result_view[i] = INFINITY
+            continue
+        integral = 0
+        for j in range(nodes_count):
+            d = 3*nodes[j]**2 - 1
+            integral = integral + weights[j] * (
+                exp(-2 * (2*pi*offset*T2_bound / d)**2) / fabs(d))
+        result_view[i] = T2_bound * sqrt(2/pi) * integral
+    
+    return result
@@ -2,7 +2,7 @@ import nibabel
 import numpy
 import spire
 
-from .. import entrypoint
+from .. import entrypoint, load, precision, save
 from ..cli import *
 
 class MTR(spire.TaskFactory):
@@ -22,16 +22,17 @@ class MTR(spire.TaskFactory):
         self.file_dep = [MT_off, MT_on]
         self.targets = [target]
         
-        self.actions = [(MTR.mtr_map, (MT_off, MT_on, target))]
+        self.actions = [
+            (MTR.mtr_map, (MT_off, MT_on, target, precision.get_dtype()))]
     
     @staticmethod
-    def mtr_map(MT_off_path, MT_on_path, mtr_map_path):
-        MT_off = nibabel.load(MT_off_path)
-        MT_on = nibabel.load(MT_on_path)
+    def mtr_map(MT_off_path, MT_on_path, mtr_map_path, dtype="float64"):
+        MT_off = load(MT_off_path)
+        MT_on = load(MT_on_path)
         
         with numpy.errstate(divide="ignore", invalid="ignore"):
-            MT_off_array = MT_off.get_fdata()
-            MT_on_array = MT_on.get_fdata()
+            MT_off_array = MT_off.get_fdata(dtype=dtype)
+            MT_on_array = MT_on.get_fdata(dtype=dtype)
             # If we have multiple echoes, average them
             if MT_on.ndim > 3:
                 MT_off_array = MT_off_array.mean(axis=-1)
@@ -41,7 +42,7 @@ class MTR(spire.TaskFactory):
         MTR[MTR<0] = 0
         MTR[MTR>1] = 1
         
-        nibabel.save(nibabel.Nifti1Image(MTR, MT_off.affine), mtr_map_path)
+        save(nibabel.Nifti1Image(MTR, MT_off.affine), mtr_map_path)
 
 def main():
     return entrypoint(MTR, {"MT_off": "mt_off", "MT_on": "mt_on"})
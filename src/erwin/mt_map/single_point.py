@@ -1,18 +1,18 @@
+import functools
 import itertools
+import logging
 import multiprocessing
-import warnings
+import multiprocessing.shared_memory
+import os
 
 import nibabel
 import numpy
 import scipy.integrate
-import scipy.optimize
 import spire
 
-from .. import entrypoint, get_path, load
+from .. import cache, entrypoint, get_path, load, save
 from ..cli import *
 
-import pyximport
-pyximport.install()
 from . import mpf
 
 class SinglePoint(spire.TaskFactory):
@@ -27,7 +27,11 @@ class SinglePoint(spire.TaskFactory):
             self, MT_off: str, MT_on: str, 
             mt_flip_angle: float, mt_duration: float, mt_frequency_offset: float, 
             flip_angle: float, repetition_time: float,
-            B0_map: str, B1_map: str, T1_map: str, MPF_map: str):
+            B0_map: str, B1_map: str, T1_map: str, MPF_map: str,
+            jobs: Optional[int]=None, 
+            inversion: Optional[
+                Choice["root_finding", "lookup_table"]]="root_finding",
+            mask: Optional[str]=None):
         """ :param MT_off: Path to image without MT pulse
             :param MT_on: Path to image with MT pulse
             :param mt_flip_angle: Flip angle of the MT pulse (rad)
@@ -39,6 +43,9 @@ class SinglePoint(spire.TaskFactory):
             :param B1_map: Path to the relative B₁ map
             :param T1_map: Path to the T₁ map (s)
             :param MPF_map: Path to target MPF map
+            :param jobs: Number of worker processes, defaults to the number of CPUs
+            :param inversion: Inversion of the model, either by root-finding in each voxel, or by interpolation in a lookup table
+            :param mask: Path to the mask of voxels where the MPF is computed
         """
         
         spire.TaskFactory.__init__(self, str(MPF_map))
@@ -49,6 +56,8 @@ class SinglePoint(spire.TaskFactory):
         
         self.file_dep = [
             get_path(x) for x in [MT_off, MT_on, B0_map, B1_map, T1_map]]
+        if mask is not None:
+            self.file_dep.append(get_path(mask))
         self.targets = [MPF_map]
         
         self.actions = [
@@ -58,7 +67,7 @@ class SinglePoint(spire.TaskFactory):
                     MT_off, MT_on,
                     mt_flip_angle, mt_duration, mt_frequency_offset, 
                     flip_angle, repetition_time, 
-                    B0_map, B1_map, T1_map, MPF_map))]
+                    B0_map, B1_map, T1_map, MPF_map, jobs, inversion, mask))]
     
     @staticmethod
     def mpf_map(
@@ -66,7 +75,7 @@ class SinglePoint(spire.TaskFactory):
             mt_flip_angle, mt_duration, mt_frequency_offset, 
             flip_angle, repetition_time,
             B0_map_path, B1_map_path, T1_map_path, 
-            MPF_map_path):
+            MPF_map_path, jobs=None, inversion="root_finding", mask_path=None):
         
         # Load the images
         MT_off, MT_on = [load(x) for x in [MT_off_path, MT_on_path]]
@@ -74,66 +83,152 @@ class SinglePoint(spire.TaskFactory):
         B1_map = load(B1_map_path)
         T1_map = load(T1_map_path)
         
-        # Derived data
-        T1 = T1_map.get_fdata()
+        source_arrays = [x.get_fdata() for x in [MT_off, MT_on]]
+        if MT_off.ndim > 3:
+            source_arrays = [x.mean(axis=-1) for x in source_arrays]
         with numpy.errstate(divide="ignore", invalid="ignore"):
-            R1 = 1/T1
+            S_ratio = source_arrays[1]/source_arrays[0]
+        T1 = T1_map.get_fdata()
+        
+        # Only process the voxels of the mask where the model is defined, 
+        # packed in 1D arrays
+        selection = numpy.isfinite(S_ratio) & numpy.isfinite(T1) & (T1 > 0)
+        if mask_path is not None:
+            selection &= (load(mask_path).get_fdata() != 0)
+        S_ratio = S_ratio[selection]
+        T1 = T1[selection]
+        
+        # Derived data
+        R1 = 1/T1
         T2_free = 0.022*T1
-        delta_omega = mt_frequency_offset - B0_map.get_fdata()
+        delta_omega = mt_frequency_offset - B0_map.get_fdata()[selection]
         
-        # Compute all possible lineshapes, and get the lineshape for each voxel
-        # of the delta_omega map (rounded to the nearest Hz).
-        lineshapes = SinglePoint.super_lorentzian_lineshapes(11e-6)
-        G = lineshapes[delta_omega.round().astype(int)]
+        # Lineshape for each voxel of the delta_omega map
+        G = SinglePoint.get_lineshape(delta_omega, 11e-6)
         
         # Saturation power of the MT saturation pulse
         omega_1_rms_nominal = SinglePoint.omega_1_rms_gaussian_pulse(
             mt_duration, mt_flip_angle)
-        omega_1_rms = omega_1_rms_nominal * B1_map.get_fdata()
-        
-        source_arrays = [x.get_fdata() for x in [MT_off, MT_on]]
-        if MT_off.ndim > 3:
-            source_arrays = [x.mean(axis=-1) for x in source_arrays]
-        with numpy.errstate(divide="ignore", invalid="ignore"):
-            S_ratio = source_arrays[1]/source_arrays[0]
+        omega_1_rms = omega_1_rms_nominal * B1_map.get_fdata()[selection]
         
         f0 = 0.10
         
-        f = SinglePoint.estimate_f_map(
-            S_ratio, R1, T2_free, delta_omega, omega_1_rms, G,
-            repetition_time, mt_duration, flip_angle, f0)
-
+        if len(S_ratio) == 0:
+            f, converged = numpy.empty(0), numpy.empty(0, bool)
+        elif inversion == "lookup_table":
+            table = SinglePoint.get_lookup_table(
+                repetition_time, mt_duration, flip_angle, omega_1_rms_nominal,
+                mt_frequency_offset, 11e-6)
+            f, converged = SinglePoint.invert_lookup_table(
+                table, S_ratio, R1, omega_1_rms, delta_omega)
+            
+            error = SinglePoint.get_lookup_table_error(
+                f[converged], 
+                *[
+                    x[converged] 
+                    for x in [S_ratio, R1, T2_free, delta_omega, omega_1_rms, G]],
+                repetition_time, mt_duration, flip_angle, f0)
+            if len(error) > 0:
+                logging.info(
+                    "Lookup table vs. root-finding MPF error in {} voxels: "
+                    "median {:.2g}, maximum {:.2g}".format(
+                        len(error), numpy.median(error), numpy.max(error)))
+            
+            # Voxels outside of the table are solved by root-finding
+            remaining = ~converged
+            if remaining.any():
+                f[remaining], converged[remaining] = SinglePoint.estimate_f_map(
+                    *[
+                        x[remaining] 
+                        for x in [
+                            S_ratio, R1, T2_free, delta_omega, omega_1_rms, G]],
+                    repetition_time, mt_duration, flip_angle, f0, jobs)
+        else:
+            f, converged = SinglePoint.estimate_f_map(
+                S_ratio, R1, T2_free, delta_omega, omega_1_rms, G,
+                repetition_time, mt_duration, flip_angle, f0, jobs)
+        logging.info(
+            "MPF estimation did not converge in {} of {} voxels".format(
+                numpy.count_nonzero(~converged), converged.size))
+        
+        # Scatter the results back in the image
+        f_map = numpy.full(selection.shape, numpy.nan)
+        f_map[selection] = f
+        f = f_map
+        
         # Clamp the MPF map in its "true" range
         f[f<0] = numpy.nan
         f[f>1] = numpy.nan
         
         # Save as percents
-        nibabel.save(nibabel.Nifti1Image(1e2*f, MT_off.affine), MPF_map_path)
+        save(nibabel.Nifti1Image(1e2*f, MT_off.affine), MPF_map_path)
     
     @staticmethod
-    def super_lorentzian_lineshapes(T2_bound):
-        """ From "Quantitative Magnetization Transfer Imaging Made Easy with 
-            qMTLab: Software for Data Simulation, Analysis, and Visualization".
-            Cabana et al. Concepts in Magnetic Resonance 44A(5). 2015
+    def get_lineshape(frequency_offsets, T2_bound, resolution=1, max_offset=1e4):
+        """ Return the super-Lorentzian lineshape at arbitrary frequency 
+            offsets (Hz). The lineshape is interpolated in a table sampled at
+            the given resolution (Hz) up to max_offset (Hz), and computed
+            directly outside of this range. Since the lineshape is even, 
+            negative offsets are supported.
         """
         
-        frequency_offsets = numpy.arange(1, 1e4+1)
-        G = numpy.zeros(len(frequency_offsets))
+        table_offsets, table = SinglePoint.super_lorentzian_lineshapes(
+            T2_bound, resolution, max_offset)
         
-        # From equation 7. Note that the expression differs from the one given 
-        # in doi:10.1006/jmrb.1995.1111 (and also doi:10.1002/mrm.10120 and
-        # doi:10.1002/mrm.22562) as the sin θ term disappears.
-        for i, offset in enumerate(frequency_offsets):
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                integral, _ = scipy.integrate.quad(
-                    mpf.super_lorentzian_differential, 0, 1, (offset, T2_bound), 
-                    limit=150)
-            G[i] = T2_bound * numpy.sqrt(2/numpy.pi) * integral
+        offsets = numpy.abs(numpy.asarray(frequency_offsets, float))
+        G = numpy.array(numpy.interp(offsets, table_offsets, table))
+        
+        outside = (offsets < table_offsets[0]) | (offsets > table_offsets[-1])
+        if outside.any():
+            G[outside] = SinglePoint.super_lorentzian(
+                offsets[outside], T2_bound)
+        G[numpy.isnan(offsets)] = numpy.nan
         
         return G
     
     @staticmethod
+    @functools.lru_cache()
+    def super_lorentzian_lineshapes(T2_bound, resolution=1, max_offset=1e4):
+        """ Return the frequency offsets (Hz) and the super-Lorentzian
+            lineshape on a regular grid from resolution to max_offset. The 
+            table is cached on disk.
+        """
+        
+        def compute():
+            frequency_offsets = resolution * numpy.arange(
+                1, round(max_offset/resolution)+1)
+            return {
+                "frequency_offsets": frequency_offsets,
+                "G": SinglePoint.super_lorentzian(frequency_offsets, T2_bound)}
+        
+        arrays = cache.cached_arrays(
+            "super_lorentzian", 
+            {
+                # Version of the quadrature: the tables of the previous
+                # versions are not re-used
+                "version": 2,
+                "T2_bound": T2_bound, "resolution": resolution, 
+                "max_offset": max_offset},
+            compute)
+        return arrays["frequency_offsets"], arrays["G"]
+    
+    @staticmethod
+    def super_lorentzian(frequency_offsets, T2_bound):
+        """ From "Quantitative Magnetization Transfer Imaging Made Easy with 
+            qMTLab: Software for Data Simulation, Analysis, and Visualization".
+            Cabana et al. Concepts in Magnetic Resonance 44A(5). 2015
+            
+            The integral is computed for all the frequency offsets (Hz) at
+            once, in parallel. The lineshape is infinite at 0 Hz.
+        """
+        
+        frequency_offsets = numpy.asarray(frequency_offsets, float)
+        return mpf.super_lorentzian_batch(
+            numpy.ascontiguousarray(frequency_offsets.ravel()), T2_bound
+        ).reshape(frequency_offsets.shape)
+    
+    @staticmethod
+    @functools.lru_cache()
     def omega_1_rms_gaussian_pulse(duration, angle):
         """ Estimation of the saturation pulse, w1rms. 
             Fast Macromolecular Proton Fraction Mapping from A Single Off-Resonance 
@@ -173,52 +268,331 @@ class SinglePoint(spire.TaskFactory):
     @staticmethod
     def estimate_f_map(
             S_ratio, R1, T2_free, delta_omega, omega_1_rms, 
-            G, TR, duration, flip_angle, f0):
+            G, TR, duration, flip_angle, f0, jobs=None):
         
         shape = S_ratio.shape
+        size = S_ratio.size
+        jobs = jobs or os.cpu_count()
         
-        chunk_size = int(1e4)
-        chunks_count = numpy.cumprod(shape)[-1] // chunk_size
-        
-        S_ratio = numpy.array_split(S_ratio.ravel(), chunks_count)
-        R1 = numpy.array_split(R1.ravel(), chunks_count)
-        T2_free = numpy.array_split(T2_free.ravel(), chunks_count)
-        delta_omega = numpy.array_split(delta_omega.ravel(), chunks_count)
-        omega_1_rms = numpy.array_split(omega_1_rms.ravel(), chunks_count)
-        G = numpy.array_split(G.ravel(), chunks_count)
-        
-        # FIXME: dont' use fixed value
-        with multiprocessing.Pool(4) as pool:
-            f = pool.starmap(
-                SinglePoint.estimate_f_map_worker,
-                zip(
-                    S_ratio, R1, T2_free, delta_omega, omega_1_rms, G,
-                    itertools.repeat(TR, len(R1)), 
-                    itertools.repeat(duration, len(R1)), 
-                    itertools.repeat(flip_angle, len(R1)), 
-                    itertools.repeat(f0, len(R1))))
-        
-        f = numpy.concatenate(f).reshape(shape)
-        return f
+        # Split the voxels in many more chunks than workers, so that the 
+        # workers are kept busy even if the cost of the chunks differs (e.g.
+        # background vs. brain), while keeping the overhead of small chunks low.
+        chunk_size = max(1000, -(-size // (16*jobs)))
+        
+        # Inputs and outputs are stored in shared memory, and the workers only
+        # receive the bounds of their chunk.
+        inputs = [S_ratio, R1, T2_free, delta_omega, omega_1_rms, G]
+        memory = multiprocessing.shared_memory.SharedMemory(
+            create=True, size=(len(inputs)+2)*size*numpy.dtype(float).itemsize)
+        try:
+            data = numpy.ndarray((len(inputs)+2, size), float, memory.buf)
+            for index, array in enumerate(inputs):
+                data[index] = numpy.broadcast_to(array, shape).ravel()
+            
+            # NOTE: a single chunk runs in this process on all the threads,
+            # otherwise each process of the pool runs on a single thread.
+            chunks = [
+                (
+                    memory.name, data.shape, start, min(start+chunk_size, size),
+                    TR, duration, flip_angle, f0, 
+                    jobs if size <= chunk_size else 1)
+                for start in range(0, size, chunk_size)]
+            if jobs == 1 or len(chunks) == 1:
+                for chunk in chunks:
+                    SinglePoint.estimate_f_map_worker(*chunk)
+            else:
+                with multiprocessing.Pool(min(jobs, len(chunks))) as pool:
+                    for _ in pool.imap_unordered(
+                            SinglePoint.estimate_f_map_worker_star, chunks):
+                        pass
+            
+            f = data[-2].reshape(shape).copy()
+            converged = data[-1].reshape(shape) != 0
+            del data
+        finally:
+            memory.close()
+            memory.unlink()
+        
+        return f, converged
+    
+    @staticmethod
+    def estimate_f_map_worker_star(arguments):
+        return SinglePoint.estimate_f_map_worker(*arguments)
     
     @staticmethod
     def estimate_f_map_worker(
-            S_ratio, R1, T2_free, delta_omega, omega_1_rms, 
-            G, TR, duration, flip_angle, f0):
-        
-        f = numpy.empty(R1.shape)
-        for index in numpy.ndindex(f.shape):
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                root = scipy.optimize.fsolve(
-                    mpf.model, f0, 
-                    (
-                        S_ratio[index], R1[index], T2_free[index], 
-                        delta_omega[index], omega_1_rms[index], G[index], 
-                        TR, duration, flip_angle))
-            f[index] = root[0]
-        
-        return f
+            name, shape, start, stop, TR, duration, flip_angle, f0, threads=1):
+        
+        memory = multiprocessing.shared_memory.SharedMemory(name)
+        try:
+            data = numpy.ndarray(shape, float, memory.buf)
+            data[-2, start:stop], data[-1, start:stop] = SinglePoint.find_roots(
+                functools.partial(mpf.model_batch, threads=threads), 
+                f0, 0, 1-1e-9,
+                (*data[:-2, start:stop], TR, duration, flip_angle))
+            del data
+        finally:
+            memory.close()
+    
+    @staticmethod
+    def get_lookup_table(
+            TR, duration, flip_angle, omega_1_rms_nominal, mt_frequency_offset,
+            T2_bound):
+        """ Return the ratio of the MT-weighted and reference signals 
+            ("S_ratio"), tabulated for a protocol on a grid of R₁ (Hz),
+            saturation power (rad/s), Δω (Hz) and MPF ("R1", "omega_1_rms",
+            "delta_omega" and "f"). The table is cached on disk.
+        """
+        
+        def compute():
+            R1 = numpy.geomspace(0.1, 10, 64)
+            omega_1_rms = omega_1_rms_nominal * numpy.linspace(0.2, 2, 32)
+            delta_omega = mt_frequency_offset + numpy.linspace(-500, 500, 8)
+            f = numpy.linspace(0, 0.5, 101)
+            
+            G = SinglePoint.get_lineshape(delta_omega, T2_bound)
+            S_ratio = -SinglePoint.model(
+                f, 0, R1[:, None, None, None], 0.022/R1[:, None, None, None],
+                delta_omega[:, None], omega_1_rms[:, None, None], G[:, None],
+                TR, duration, flip_angle)
+            
+            return {
+                "R1": R1, "omega_1_rms": omega_1_rms, 
+                "delta_omega": delta_omega, "f": f, "S_ratio": S_ratio}
+        
+        return cache.cached_arrays(
+            "mpf_lookup_table",
+            {
+                "TR": TR, "duration": duration, "flip_angle": flip_angle,
+                "omega_1_rms_nominal": omega_1_rms_nominal, 
+                "mt_frequency_offset": mt_frequency_offset, 
+                "T2_bound": T2_bound},
+            compute)
+    
+    @staticmethod
+    def invert_lookup_table(
+            table, S_ratio, R1, omega_1_rms, delta_omega, chunk_size=int(1e6)):
+        """ Return the MPF map interpolated in a lookup table, and the mask of
+            voxels inside the table. Voxels outside of the table are NaN.
+        """
+        
+        shape = S_ratio.shape
+        S_ratio, R1, omega_1_rms, delta_omega = [
+            numpy.ravel(x) for x in [S_ratio, R1, omega_1_rms, delta_omega]]
+        
+        axes = [table[x] for x in ["R1", "omega_1_rms", "delta_omega"]]
+        f_grid = table["f"]
+        values = table["S_ratio"].reshape(-1, len(f_grid))
+        
+        f = numpy.full(S_ratio.size, numpy.nan)
+        for start in range(0, S_ratio.size, chunk_size):
+            chunk = slice(start, start+chunk_size)
+            
+            # Cell of each voxel in the table, and position in the cell
+            inside = numpy.isfinite(S_ratio[chunk])
+            cells, positions = [], []
+            for axis, value in zip(
+                    axes, [R1[chunk], omega_1_rms[chunk], delta_omega[chunk]]):
+                with numpy.errstate(invalid="ignore"):
+                    inside &= (axis[0] <= value) & (value <= axis[-1])
+                cell = (numpy.searchsorted(axis, value, "right")-1).clip(
+                    0, len(axis)-2)
+                cells.append(cell)
+                positions.append((value-axis[cell])/(axis[cell+1]-axis[cell]))
+            cells = [x[inside] for x in cells]
+            positions = [x[inside] for x in positions]
+            S = S_ratio[chunk][inside]
+            
+            # Index and weight of the corners of the cell, for a trilinear
+            # interpolation
+            corners, weights = [], []
+            for offsets in itertools.product([0, 1], repeat=3):
+                corners.append(
+                    numpy.ravel_multi_index(
+                        [x+o for x, o in zip(cells, offsets)], 
+                        [len(x) for x in axes]))
+                weights.append(
+                    numpy.prod(
+                        [
+                            p if o else 1-p 
+                            for p, o in zip(positions, offsets)], axis=0))
+            corners = numpy.array(corners).T
+            weights = numpy.array(weights).T
+            
+            def interpolate(index):
+                return (
+                    values[corners, index[:, None]]*weights).sum(axis=1)
+            
+            # S_ratio decreases with f: bisect the grid of f to find the 
+            # bracketing points, and interpolate linearly between them.
+            lower = numpy.zeros(len(S), int)
+            upper = numpy.full(len(S), len(f_grid)-1)
+            S_lower, S_upper = interpolate(lower), interpolate(upper)
+            bracketed = (S_upper <= S) & (S <= S_lower)
+            while numpy.any(upper-lower > 1):
+                middle = (lower+upper)//2
+                S_middle = interpolate(middle)
+                above = S_middle >= S
+                lower = numpy.where(above, middle, lower)
+                S_lower = numpy.where(above, S_middle, S_lower)
+                upper = numpy.where(above, upper, middle)
+                S_upper = numpy.where(above, S_upper, S_middle)
+            
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                f_chunk = (
+                    f_grid[lower] 
+                    + (S_lower-S)/(S_lower-S_upper) 
+                        * (f_grid[upper]-f_grid[lower]))
+            f[chunk][inside] = numpy.where(bracketed, f_chunk, numpy.nan)
+        
+        return f.reshape(shape), numpy.isfinite(f).reshape(shape)
+    
+    @staticmethod
+    def get_lookup_table_error(
+            f, S_ratio, R1, T2_free, delta_omega, omega_1_rms, G, 
+            TR, duration, flip_angle, f0, samples=1000):
+        """ Return the absolute difference between the MPF estimated from the
+            lookup table and by root-finding, on a random sample of voxels.
+        """
+        
+        indices = numpy.random.default_rng(0).choice(
+            f.size, min(samples, f.size), replace=False)
+        expected, _ = SinglePoint.find_roots(
+            SinglePoint.model, f0, 0, 1-1e-9,
+            (
+                *[
+                    numpy.ravel(x)[indices] 
+                    for x in [S_ratio, R1, T2_free, delta_omega, omega_1_rms, G]],
+                TR, duration, flip_angle))
+        
+        return numpy.abs(numpy.ravel(f)[indices] - expected)
+    
+    @staticmethod
+    def model(
+            f, S_ratio, R1, T2_free, delta_omega, omega_1_rms, G, 
+            TR, duration, flip_angle):
+        """ Difference between the measured ratio of the MT-weighted and 
+            reference signals and the modeled one, for arrays of voxels.
+        """
+        
+        S_ref = SinglePoint.ramani_signal(
+            f, R1, T2_free, duration, delta_omega, TR, flip_angle, 0, G)
+        S_mt = SinglePoint.ramani_signal(
+            f, R1, T2_free, duration, delta_omega, TR, flip_angle, 
+            omega_1_rms, G)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            return numpy.where(S_ref == 0, numpy.nan, S_ratio - S_mt/S_ref)
+    
+    @staticmethod
+    def ramani_signal(
+            f, R1, T2_free, duration, delta_omega, TR, flip_angle, 
+            omega_1_rms, G):
+        """ Signal proportional to the magnetization, using Ramani's formula.
+            This is the vectorized version of mpf.newRamani_corr.
+        """
+        
+        R1f = R1
+        R1b = R1
+        
+        R = 19. # [s^-1]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            k = R*f/(1.-f)
+            
+            # Time-averaged saturation rate for the free and bound pools
+            Wf = (omega_1_rms / (2*numpy.pi*delta_omega))**2 / T2_free
+            Wb = numpy.pi * omega_1_rms**2 * G
+            
+            beta = -numpy.log(numpy.cos(flip_angle))/TR
+            s = duration/TR
+            
+            # NOTE: k/F is equal to R, and is also defined for f=0
+            Y1 = R1b*k/R1f + s*Wb + R1b + R
+            Y2 = k/R1f*(R1b + s*Wb) + (1. + s*Wf/R1f + beta/R1f)*(s*Wb + R1b + R)
+            
+            Mzf = (1.-f)*Y1/Y2
+        
+        return Mzf * numpy.sin(flip_angle)
+    
+    @staticmethod
+    def find_roots(
+            function, x0, lower, upper, args=(), 
+            tolerance=1e-10, max_iterations=100):
+        """ Find the roots of a vectorized function in [lower, upper] using a 
+            Newton method safeguarded by bisection: the root is always kept 
+            bracketed, and Newton steps falling outside of the bracket are 
+            replaced by bisection steps.
+            
+            The array arguments of function must be 1D arrays of the same 
+            size; the other arguments are passed unchanged. Return the roots 
+            and the convergence flags of each element; elements where the 
+            function does not change sign in [lower, upper] are NaN and flagged
+            as not converged.
+        """
+        
+        arrays = [numpy.ndim(x) > 0 for x in args]
+        size = next(len(x) for x, is_array in zip(args, arrays) if is_array)
+        
+        def evaluate(x, indices):
+            return function(
+                x, *[
+                    x[indices] if is_array else x 
+                    for x, is_array in zip(args, arrays)])
+        
+        # Bounds of the bracket and value of the function at the lower bound
+        a = numpy.full(size, float(lower))
+        b = numpy.full(size, float(upper))
+        all_indices = numpy.arange(size)
+        f_a = evaluate(a, all_indices)
+        f_b = evaluate(b, all_indices)
+        
+        roots = numpy.full(size, numpy.nan)
+        converged = numpy.zeros(size, bool)
+        
+        for bound, value in [(a, f_a), (b, f_b)]:
+            roots[value == 0] = bound[value == 0]
+            converged |= (value == 0)
+        active = (numpy.sign(f_a) * numpy.sign(f_b) < 0) & ~converged
+        
+        x = numpy.where((a < x0) & (x0 < b), x0, 0.5*(a+b))
+        
+        # Step of the finite-difference derivative
+        h = 1e-8
+        
+        for _ in range(max_iterations):
+            indices = numpy.nonzero(active)[0]
+            if len(indices) == 0:
+                break
+            
+            x_i, a_i, b_i, f_a_i = [y[indices] for y in [x, a, b, f_a]]
+            
+            f_x = evaluate(x_i, indices)
+            step = numpy.where(x_i+h <= b_i, h, -h)
+            derivative = (evaluate(x_i+step, indices) - f_x)/step
+            
+            # Shrink the bracket
+            same_sign = numpy.sign(f_x) == numpy.sign(f_a_i)
+            a_i = numpy.where(same_sign, x_i, a_i)
+            f_a_i = numpy.where(same_sign, f_x, f_a_i)
+            b_i = numpy.where(same_sign, b_i, x_i)
+            
+            # Newton step, or bisection if it leaves the bracket
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                x_new = x_i - f_x/derivative
+            outside = ~((a_i < x_new) & (x_new < b_i))
+            x_new[outside] = 0.5*(a_i+b_i)[outside]
+            
+            done = (
+                (numpy.abs(x_new-x_i) <= tolerance) | (f_x == 0) 
+                | (b_i-a_i <= tolerance))
+            x_new[f_x == 0] = x_i[f_x == 0]
+            
+            x[indices], a[indices], b[indices], f_a[indices] = (
+                x_new, a_i, b_i, f_a_i)
+            roots[indices[done]] = x_new[done]
+            converged[indices[done]] = True
+            active[indices[done]] = False
+        
+        return roots, converged
 
 def main():
     return entrypoint(
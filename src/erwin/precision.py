@@ -0,0 +1,53 @@
+import contextlib
+
+import numpy
+
+# Names of the supported floating-point types
+dtypes = ["float32", "float64"]
+
+_dtype = "float64"
+
+def get_dtype():
+    """ Return the name of the active floating-point type of the voxelwise
+        computations and of their results.
+    """
+
+    return _dtype
+
+def set_dtype(dtype):
+    """ Set the active floating-point type (e.g. "float32" or numpy.float32),
+        return the previous one.
+    """
+
+    global _dtype
+
+    name = numpy.dtype(dtype).name
+    if name not in dtypes:
+        raise ValueError(
+            "Unsupported precision: {} (must be one of {})".format(
+                name, ", ".join(dtypes)))
+
+    previous = _dtype
+    _dtype = name
+    return previous
+
+@contextlib.contextmanager
+def using(dtype):
+    """ Use a floating-point type for the tasks created in the context. The
+        type is stored in the tasks, and is then also used when they are run
+        outside of the context or in other processes.
+
+        :param dtype: floating-point type, e.g. "float32" or numpy.float32
+    """
+
+    previous = set_dtype(dtype)
+    try:
+        yield get_dtype()
+    finally:
+        set_dtype(previous)
+
+def get_complex_dtype(dtype):
+    """ Return the complex type matching a floating-point type.
+    """
+
+    return numpy.result_type(dtype, numpy.complex64).name
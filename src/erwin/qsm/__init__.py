@@ -1,8 +1,12 @@
 """ Magnetic susceptibility
 """
 
-from .background_field_removal import BackgroundFieldRemoval
-from .medi_l1 import MediL1
-from .r2_star import R2Star
-from .total_field import TotalField
-from .ventricles_mask import VentriclesMask
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "BackgroundFieldRemoval": "background_field_removal",
+        "MediL1": "medi_l1",
+        "R2Star": "r2_star",
+        "TotalField": "total_field",
+        "VentriclesMask": "ventricles_mask"})
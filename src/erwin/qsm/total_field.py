@@ -7,6 +7,7 @@ import numpy
 import spire
 
 from .. import entrypoint
+from ..misc.phase_unwrapping import PhaseUnwrapping
 from ..cli import *
 
 class TotalField(spire.TaskFactory):
@@ -16,13 +17,16 @@ class TotalField(spire.TaskFactory):
     def __init__(
             self, magnitude: str, phase: str, echo_times: Tuple[float, ...],
             f_total: str, sd_noise: Optional[str]=None,
-            phi_0: Optional[str]=None):
+            phi_0: Optional[str]=None, unwrap: Flag=False,
+            threads: Optional[int]=None):
         """ :param magnitude: Path to source magnitude images
             :param phase: Path to source phase images
             :param echo_times: Echo times (s)
             :param f_total: Path to target total field image
             :param sd_noise: Path to target map of standard deviation of noise in total susceptibility field
             :param phi_0: Path to target map of phase extrapolated at t=0
+            :param unwrap: Unwrap the total field (Laplacian method)
+            :param threads: Number of threads of the unwrapping, defaults to all CPUs
         """
         
         spire.TaskFactory.__init__(self, str(f_total))
@@ -36,9 +40,13 @@ class TotalField(spire.TaskFactory):
         
         self.actions = [(
             __class__.action,
-            (magnitude, phase, echo_times, f_total, sd_noise, phi_0))]
+            (
+                magnitude, phase, echo_times, f_total, sd_noise, phi_0,
+                unwrap, threads))]
     
-    def action(magnitude_path, phase_path, echo_times, f_total_path, sd_noise_path, phi_0_path):
+    def action(
+            magnitude_path, phase_path, echo_times, f_total_path, sd_noise_path,
+            phi_0_path, unwrap=False, threads=None):
         
         import meg
         
@@ -64,6 +72,10 @@ class TotalField(spire.TaskFactory):
             sd_noise = engine["sd_noise"]
             phi_0 = engine["phi_0"]
         
+        if unwrap:
+            f_total = PhaseUnwrapping.unwrap(
+                f_total, magnitude_image.header.get_zooms()[:3], threads)
+        
         nibabel.save(
             nibabel.Nifti1Image(f_total, magnitude_image.affine), f_total_path)
         if sd_noise_path is not None:
@@ -0,0 +1,138 @@
+import ast
+import os
+import re
+
+from . import cache
+
+def get_registry():
+    """ Return the registry of methods, as a dictionary mapping the name of
+        the modules (e.g. "b0_map.double_echo") and of the packages
+        (e.g. "b0_map") to their summary.
+
+        The registry is built from the source files without importing them,
+        and cached until the version of erwin or the source files change.
+    """
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    sources = get_sources(root)
+
+    key = {
+        "version": get_version(),
+        # Invalidate the cache if the registry itself changes
+        "registry": os.stat(__file__).st_mtime_ns,
+        "sources": {
+            name: os.stat(path).st_mtime_ns for name, path in sources.items()}}
+    registry = cache.load_json("registry", key)
+    if registry is None:
+        registry = build_registry(sources)
+        cache.save_json("registry", key, registry)
+
+    return registry
+
+def build_registry(sources):
+    """ Return the registry of methods from the source files of the packages
+        and of the modules.
+    """
+
+    registry = {}
+    for name, path in sources.items():
+        with open(path, "rb") as fd:
+            tree = ast.parse(fd.read(), path)
+
+        if "." not in name:
+            summary = get_summary(ast.get_docstring(tree))
+        else:
+            class_ = get_entrypoint_class(tree)
+            if class_ is None:
+                continue
+            summary = get_summary(ast.get_docstring(class_))
+        registry[name] = summary
+
+    return registry
+
+def get_sources(root):
+    """ Return the source files of the packages and of their modules, keyed
+        by their name relative to erwin.
+    """
+
+    sources = {}
+    for package in sorted(os.listdir(root)):
+        directory = os.path.join(root, package)
+        if not os.path.isfile(os.path.join(directory, "__init__.py")):
+            continue
+        sources[package] = os.path.join(directory, "__init__.py")
+        for entry in sorted(os.listdir(directory)):
+            module, extension = os.path.splitext(entry)
+            if extension == ".py" and module != "__init__":
+                sources["{}.{}".format(package, module)] = os.path.join(
+                    directory, entry)
+    return sources
+
+def get_entrypoint(name):
+    """ Return the name of the class passed to entrypoint in the main function
+        of a method (e.g. "t1_map.vfa") and the aliases of its arguments, or
+        None if there is no such method. The module is not imported.
+    """
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    path = get_sources(root).get(name)
+    if path is None or "." not in name:
+        return None
+    with open(path, "rb") as fd:
+        tree = ast.parse(fd.read(), path)
+
+    call = get_entrypoint_call(tree)
+    if call is None:
+        return None
+    aliases = call.args[1] if len(call.args) > 1 else next(
+        (x.value for x in call.keywords if x.arg == "aliases"), None)
+    return (
+        call.args[0].id,
+        ast.literal_eval(aliases) if aliases is not None else None)
+
+def get_entrypoint_class(tree):
+    """ Return the definition of the class passed to entrypoint in the main
+        function of a module, or None.
+    """
+
+    call = get_entrypoint_call(tree)
+    if call is None:
+        return None
+    classes = {
+        x.name: x for x in tree.body if isinstance(x, ast.ClassDef)}
+    return classes.get(call.args[0].id)
+
+def get_entrypoint_call(tree):
+    """ Return the call to entrypoint in the main function of a module, or
+        None.
+    """
+
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef) or node.name != "main":
+            continue
+        for call in ast.walk(node):
+            if (
+                    isinstance(call, ast.Call)
+                    and isinstance(call.func, ast.Name)
+                    and call.func.id == "entrypoint"
+                    and call.args and isinstance(call.args[0], ast.Name)):
+                return call
+    return None
+
+def get_summary(docstring):
+    """ Return the first paragraph of a docstring, on a single line.
+    """
+
+    paragraph = re.split(
+        r"^\s*$", (docstring or "").strip(), flags=re.MULTILINE)[0]
+    return re.sub(r"\s+", " ", paragraph).strip()
+
+def get_version():
+    """ Return the version of the installed erwin package, or None.
+    """
+
+    try:
+        import importlib.metadata
+        return importlib.metadata.version("erwin")
+    except Exception:
+        return None
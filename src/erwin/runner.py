@@ -0,0 +1,297 @@
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from . import image_cache, tracing
+from .state import State
+
+# Status of a task after a call to run
+DONE = "done"
+UP_TO_DATE = "up-to-date"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+def run(
+        tasks, jobs=1, keep_going=False, state=None, cache_size=None,
+        trace=None):
+    """ Run the given Spire tasks, respecting the dependencies between their
+        targets and their file dependencies. Independent tasks are run
+        concurrently if more than one job is requested.
+
+        :param tasks: sequence of tasks, in any order
+        :param jobs: number of concurrent processes, None to use all CPUs. The
+            tasks are run in the current process if jobs is 1.
+        :param keep_going: keep running the tasks which do not depend on a
+            failed task instead of raising the error
+        :param state: path to a state database or State object. If specified,
+            the tasks which are up-to-date are not run. The database is
+            written periodically and at the end of the run.
+        :param cache_size: if specified, size (in bytes) of the cache of the
+            images saved by the tasks, which avoids reading them again in later
+            tasks. The cache is local to each process.
+        :param trace: if specified, path to a trace file (Chrome trace format)
+            of the time, memory and I/O of each task and action. A summary is
+            printed on the standard error.
+        :return: status of each task, in the same order as tasks
+    """
+
+    if jobs is None:
+        jobs = os.cpu_count()
+
+    if state is not None and not isinstance(state, State):
+        state = State(state)
+
+    dependencies = get_dependencies(tasks)
+    statuses = [None] * len(tasks)
+    errors = []
+    events = []
+
+    # Number of unfinished dependencies of each task, and tasks depending on
+    # each task
+    remaining = [len(x) for x in dependencies]
+    dependents = [[] for _ in tasks]
+    for index, task_dependencies in enumerate(dependencies):
+        for dependency in task_dependencies:
+            dependents[dependency].append(index)
+    # Pending tasks whose dependencies are all done
+    queue = collections.deque(
+        index for index, count in enumerate(remaining) if count == 0)
+
+    # The state database is written at most every save_interval seconds, and
+    # when the run ends
+    save_interval = 10
+    last_save = time.monotonic()
+    unsaved = False
+
+    def finish(index, status):
+        """ Set the status of a finished task, and update the tasks which
+            depend on it: the ones depending on a failed task are skipped.
+        """
+
+        statuses[index] = status
+        if status in [DONE, UP_TO_DATE]:
+            for dependent in dependents[index]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0 and statuses[dependent] is None:
+                    queue.append(dependent)
+        else:
+            stack = list(dependents[index])
+            while stack:
+                dependent = stack.pop()
+                if statuses[dependent] is None:
+                    logging.warning(
+                        "Skipping {}".format(get_name(tasks[dependent])))
+                    statuses[dependent] = SKIPPED
+                    stack.extend(dependents[dependent])
+
+    def get_ready():
+        """ Return the indices of the tasks which are ready to run. The
+            up-to-date tasks are not returned, and the tasks depending on them
+            are checked in turn.
+        """
+
+        ready = []
+        while queue:
+            index = queue.popleft()
+            if statuses[index] is not None:
+                continue
+            if state is not None and state.is_up_to_date(tasks[index]):
+                logging.info("Up-to-date: {}".format(get_name(tasks[index])))
+                finish(index, UP_TO_DATE)
+            else:
+                ready.append(index)
+        return ready
+
+    def save_state(force=False):
+        nonlocal last_save, unsaved
+        if state is None or not unsaved:
+            return
+        if force or time.monotonic() - last_save >= save_interval:
+            state.save()
+            last_save = time.monotonic()
+            unsaved = False
+
+    def on_success(index):
+        nonlocal unsaved
+        finish(index, DONE)
+        if state is not None:
+            state.update(tasks[index])
+            unsaved = True
+            save_state()
+
+    def on_error(index, error):
+        logging.error("{} failed: {}".format(get_name(tasks[index]), error))
+        finish(index, FAILED)
+        errors.append(error)
+
+    def run_sequential():
+        ready = collections.deque(get_ready())
+        while ready and not (errors and not keep_going):
+            index = ready.popleft()
+            try:
+                events.extend(
+                    run_actions(
+                        tasks[index].actions, get_name(tasks[index]),
+                        trace is not None))
+            except Exception as e:
+                on_error(index, e)
+            else:
+                on_success(index)
+            ready.extend(get_ready())
+
+    def run_parallel(executor):
+        running = {}
+        ready = get_ready()
+        while ready or running:
+            if not (errors and not keep_going):
+                for index in ready:
+                    future = executor.submit(
+                        run_actions, tasks[index].actions,
+                        get_name(tasks[index]), trace is not None)
+                    running[future] = index
+                ready = []
+            if not running:
+                break
+
+            finished, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                index = running.pop(future)
+                try:
+                    events.extend(future.result())
+                except Exception as e:
+                    on_error(index, e)
+                else:
+                    on_success(index)
+            ready.extend(get_ready())
+
+    try:
+        if jobs == 1:
+            if cache_size is not None:
+                context = image_cache.enabled(cache_size)
+            else:
+                context = contextlib.nullcontext()
+            with context:
+                run_sequential()
+        else:
+            if cache_size is not None:
+                initializer, initargs = image_cache.enable, (cache_size,)
+            else:
+                initializer, initargs = None, ()
+            with concurrent.futures.ProcessPoolExecutor(
+                    jobs, initializer=initializer,
+                    initargs=initargs) as executor:
+                run_parallel(executor)
+    finally:
+        save_state(True)
+
+    if trace is not None:
+        tracing.write(events, trace)
+        print(tracing.get_summary(events), file=sys.stderr)
+
+    if errors and not keep_going:
+        raise errors[0]
+
+    return [x or SKIPPED for x in statuses]
+
+def run_actions(actions, name=None, trace=False):
+    """ Run the actions of a task: lists are run as commands, tuples as
+        (function, arguments) pairs. If trace is True, return the trace
+        events of the task and of its actions.
+    """
+
+    if not trace:
+        for action in actions:
+            run_action(action)
+        return []
+
+    events = []
+    with tracing.Recorder(name, "task", name, False) as task_recorder:
+        for action in actions:
+            if isinstance(action, list):
+                action_name = os.path.basename(str(action[0]))
+            else:
+                function = action[0]
+                if isinstance(function, functools.partial):
+                    function = function.func
+                action_name = getattr(
+                    function, "__qualname__", type(function).__qualname__)
+            with tracing.Recorder(action_name, "action", name) as recorder:
+                run_action(action)
+            events.append(recorder.event)
+    task_event = task_recorder.event
+    task_event["args"]["peak_memory"] = max(
+        [
+            x["args"]["peak_memory"] for x in events
+            if x["args"]["peak_memory"] is not None],
+        default=None)
+    events.insert(0, task_event)
+
+    return events
+
+def run_action(action):
+    """ Run an action, either a command (list) or a (function, arguments) pair.
+    """
+
+    if isinstance(action, list):
+        subprocess.check_call(action)
+    elif isinstance(action, tuple):
+        action[0](*action[1])
+
+def get_dependencies(tasks):
+    """ Return, for each task, the indices of the tasks producing one of its
+        file dependencies.
+    """
+
+    producers = {}
+    for index, task in enumerate(tasks):
+        for target in getattr(task, "targets", []):
+            producers[normalize(target)] = index
+
+    dependencies = [
+        set(
+            producers[normalize(x)]
+            for x in getattr(task, "file_dep", [])
+            if normalize(x) in producers) - {index}
+        for index, task in enumerate(tasks)]
+
+    # Detect cycles using a depth-first traversal
+    state = [None] * len(tasks)
+    for root in range(len(tasks)):
+        stack = [(root, False)]
+        while stack:
+            index, visited = stack.pop()
+            if visited:
+                state[index] = "done"
+            elif state[index] == "done":
+                continue
+            elif state[index] == "visiting":
+                raise Exception(
+                    "Cyclic dependency on {}".format(get_name(tasks[index])))
+            else:
+                state[index] = "visiting"
+                stack.append((index, True))
+                stack.extend(
+                    (x, False) for x in dependencies[index]
+                    if state[x] != "done")
+
+    return dependencies
+
+def get_name(task):
+    """ Return a printable name of the task.
+    """
+
+    return getattr(task, "basename", None) or type(task).__name__
+
+def normalize(path):
+    """ Normalize a path so that file dependencies and targets match.
+    """
+
+    # NOTE: may be a pathlib.Path
+    return os.path.abspath(str(path))
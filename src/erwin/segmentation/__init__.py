@@ -1,4 +1,8 @@
 """ Image segmentation
 """
 
-from .bet import BET
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "BET": "bet"})
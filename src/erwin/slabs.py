@@ -0,0 +1,56 @@
+import gzip
+import importlib.util
+import logging
+
+class SlabReader(object):
+    """ Read slabs along the third axis of an image, in increasing order.
+
+        The slabs are read through the array proxy of the image, which only
+        reads the selected voxels. A compressed file can however not be
+        accessed at random without indexed_gzip: each read would decompress
+        the file from its start, and the cost of reading all the slabs would
+        be quadratic in their number. Such files are decompressed as a single
+        stream instead, so that the slabs of a 3D image must be read in
+        increasing order to be read only once.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self._stream = None
+
+        proxy = image.dataobj
+        file_like = getattr(proxy, "file_like", None)
+        if (
+                isinstance(file_like, str) and file_like.endswith(".gz")
+                and importlib.util.find_spec("indexed_gzip") is None):
+            if len(proxy.shape) == 3 and getattr(proxy, "order", "F") == "F":
+                self._stream = gzip.open(file_like, "rb")
+            else:
+                logging.warning(
+                    "Reading slabs of {} without indexed_gzip".format(
+                        file_like))
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def read(self, start, stop):
+        """ Return the scaled data of the slices in [start, stop) along the
+            third axis.
+        """
+
+        if self._stream is None:
+            return self.image.dataobj[:, :, start:stop]
+
+        from nibabel.volumeutils import apply_read_scaling, array_from_file
+
+        proxy = self.image.dataobj
+        stop = min(stop, proxy.shape[2])
+        slice_size = proxy.shape[0]*proxy.shape[1]*proxy.dtype.itemsize
+        # NOTE: seeking forward in a gzip stream only decompresses the skipped
+        # data, seeking backward restarts from the start of the file.
+        data = array_from_file(
+            (*proxy.shape[:2], stop-start), proxy.dtype, self._stream,
+            proxy.offset + start*slice_size, "F")
+        return apply_read_scaling(data, proxy.slope, proxy.inter)
@@ -0,0 +1,170 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+
+class State(object):
+    """ Database of the state of the tasks run by erwin.run, used to skip the
+        tasks whose actions, file dependencies and targets have not changed
+        since their last run.
+
+        The state of a file is its modification time and size, and optionally
+        the digest of its content: if enabled, a file whose modification time
+        or size changed but whose content is identical is considered
+        unchanged.
+    """
+
+    def __init__(self, path, check_content=False):
+        """ :param path: Path to the state database (JSON)
+            :param check_content: Check the content of the files when their
+                modification time or size changed
+        """
+
+        self.path = str(path)
+        self.check_content = check_content
+
+        self.tasks = {}
+        if os.path.isfile(self.path):
+            with open(self.path) as fd:
+                self.tasks = json.load(fd)
+
+    def is_up_to_date(self, task):
+        """ Test whether the task has already been run with the same actions,
+            file dependencies and targets.
+        """
+
+        file_dep = getattr(task, "file_dep", [])
+        targets = getattr(task, "targets", [])
+        if not file_dep or not targets:
+            return False
+
+        state = self.tasks.get(get_key(task))
+        if state is None or state["actions"] != get_actions_digest(task):
+            return False
+
+        for group in ["file_dep", "targets"]:
+            paths = [str(x) for x in getattr(task, group)]
+            if sorted(paths) != sorted(state[group]):
+                return False
+            for path in paths:
+                if not self._is_unchanged(path, state[group][path]):
+                    return False
+
+        return True
+
+    def update(self, task):
+        """ Record the state of a task after a successful run.
+        """
+
+        paths = [
+            *getattr(task, "file_dep", []), *getattr(task, "targets", [])]
+        if not all(os.path.isfile(str(x)) for x in paths):
+            self.tasks.pop(get_key(task), None)
+            return
+
+        self.tasks[get_key(task)] = {
+            "actions": get_actions_digest(task),
+            **{
+                group: {
+                    str(x): get_file_state(x, self.check_content)
+                    for x in getattr(task, group, [])}
+                for group in ["file_dep", "targets"]}}
+
+    def save(self):
+        """ Atomically write the state database.
+        """
+
+        temporary_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(temporary_path, "w") as fd:
+            json.dump(self.tasks, fd)
+        os.replace(temporary_path, self.path)
+
+    def _is_unchanged(self, path, state):
+        if not os.path.isfile(path):
+            return False
+
+        current = get_file_state(path, False)
+        if current["mtime"] == state["mtime"] and current["size"] == state["size"]:
+            return True
+        elif self.check_content and state.get("digest") is not None:
+            unchanged = (
+                current["size"] == state["size"]
+                and get_file_digest(path) == state["digest"])
+            if unchanged:
+                # Avoid re-computing the digest on the next run
+                state["mtime"] = current["mtime"]
+            return unchanged
+        else:
+            return False
+
+def get_key(task):
+    """ Return the key of a task in the state database.
+    """
+
+    return ",".join(str(x) for x in getattr(task, "targets", []))
+
+def get_actions_digest(task):
+    """ Return a digest of the actions of a task, including their parameters.
+    """
+
+    hash = hashlib.sha1()
+    for action in task.actions:
+        if isinstance(action, list):
+            for item in action:
+                hash.update(str(item).encode())
+        elif isinstance(action, tuple):
+            function, arguments = action
+            update_function_digest(hash, function)
+            update_digest(hash, arguments)
+    return hash.hexdigest()
+
+def update_function_digest(hash, function):
+    """ Update a digest with a callable: its name and its code if it is a
+        function, the callable and its bound arguments if it is a partial
+        function, or its pickle otherwise (e.g. builtins and callable
+        objects).
+    """
+
+    if isinstance(function, functools.partial):
+        update_function_digest(hash, function.func)
+        update_digest(hash, (function.args, function.keywords))
+        return
+
+    hash.update(
+        getattr(function, "__qualname__", type(function).__qualname__).encode())
+    code = getattr(function, "__code__", None)
+    if code is not None:
+        hash.update(code.co_code)
+    else:
+        update_digest(hash, function)
+
+def update_digest(hash, value):
+    """ Update a digest with the pickle of a value, or its representation if
+        it cannot be pickled.
+    """
+
+    try:
+        hash.update(pickle.dumps(value))
+    except Exception:
+        hash.update(repr(value).encode())
+
+def get_file_state(path, check_content):
+    """ Return the modification time, the size, and optionally the digest of
+        the content of a file.
+    """
+
+    stat = os.stat(str(path))
+    return {
+        "mtime": stat.st_mtime_ns, "size": stat.st_size,
+        "digest": get_file_digest(path) if check_content else None}
+
+def get_file_digest(path):
+    """ Return the digest of the content of a file.
+    """
+
+    hash = hashlib.sha1()
+    with open(str(path), "rb") as fd:
+        for block in iter(lambda: fd.read(1<<20), b""):
+            hash.update(block)
+    return hash.hexdigest()
@@ -1,4 +1,8 @@
 """ T₁/R₁ mapping
 """
 
-from .vfa import VFA
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "VFA": "vfa"})
@@ -1,10 +1,10 @@
+import functools
+
 import nibabel
 import numpy
 import spire
-import sycomore
-from sycomore.units import *
 
-from .. import entrypoint, get_path, load
+from .. import cache, entrypoint, epg, get_path, load, precision, save
 from ..cli import *
 
 class VFA(spire.TaskFactory):
@@ -16,60 +16,116 @@ class VFA(spire.TaskFactory):
     """
     
     def __init__(
-            self, sources: Tuple[str, str], flip_angles: Tuple[float, float],
-            echo_time: float, repetition_time: float, B1_map: str, target: str):
+            self, sources: Tuple[str, ...], flip_angles: Tuple[float, ...],
+            echo_time: float, repetition_time: float, B1_map: str, target: str,
+            weighted: Flag=False):
         """ :param sources: Paths to source images
             :param flip_angles: Flip angles of source images (rad)
             :param echo_time: Echo time (s)
             :param repetition_time: Repetition time (s)
             :param B1_map: Path to relative B₁ map
             :param target: Path to target T₁ map (s)
+            :param weighted: Weight the linear regression by sin²(α), i.e. by the inverse variance of S/sin(α)
         """
         
         spire.TaskFactory.__init__(self, str(target))
         
+        if len(sources) != len(flip_angles):
+            raise Exception(
+                "Sources and flip angles must have the same length")
+        if len(sources) < 2:
+            raise Exception("At least two flip angles are required")
+        
         self.file_dep = [get_path(x) for x in [*sources, B1_map]]
         self.targets = [target]
         
         self.actions = [
             (VFA.t1_map, (
                 sources, flip_angles, echo_time, repetition_time, B1_map,
-                target))]
+                target, weighted, precision.get_dtype()))]
     
     def t1_map(
             source_paths, flip_angles, echo_time, repetition_time, B1_map_path,
-            T1_map_path):
+            T1_map_path, weighted=False, dtype="float64"):
         """T1 map generation"""
         
-        # Load the VFA signal
-        sources = [load(x) for x in source_paths]
-        signal = numpy.asarray([x.get_fdata() for x in sources])
-        
-        # Compute a flip angle map from the nominal flip angles
-        B1_map = load(B1_map_path).get_fdata()
-        flip_angle_map = numpy.asarray([B1_map * x for x in flip_angles])
+        B1_map = load(B1_map_path).get_fdata(dtype=dtype)
+        
+        # Linear regression of Y = S/sin(α) against X = S/tan(α), whose slope
+        # is exp(-TR/T1') (eq. 3). The flip angles are corrected by the B1 map,
+        # and the weighted sums of the regression are accumulated one source
+        # at a time, so that the memory does not depend on the number of flip
+        # angles.
+        sums = {x: 0 for x in ["w", "x", "y", "xx", "xy"]}
+        affine = None
+        for source_path, flip_angle in zip(source_paths, flip_angles):
+            source = load(source_path)
+            if affine is None:
+                affine = source.affine
+            signal = source.get_fdata(dtype=dtype)
+            
+            flip_angle_map = B1_map * flip_angle
+            sin = numpy.sin(flip_angle_map)
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                X = signal / numpy.tan(flip_angle_map)
+                Y = signal / sin
+            del signal
+            
+            w = sin**2 if weighted else 1
+            sums["w"] = sums["w"] + w
+            sums["x"] = sums["x"] + w*X
+            sums["y"] = sums["y"] + w*Y
+            sums["xx"] = sums["xx"] + w*X*X
+            sums["xy"] = sums["xy"] + w*X*Y
+            del X, Y, sin, flip_angle_map
         
-        # Compute the B1-corrected T1 map
         with numpy.errstate(divide="ignore", invalid="ignore"):
-            X = signal / numpy.tan(flip_angle_map)
-            Y = signal / numpy.sin(flip_angle_map)
             # Eq. 3b
-            SL = (Y[0]-Y[1]) / (X[0]-X[1])
+            SL = (
+                (sums["w"]*sums["xy"] - sums["x"]*sums["y"])
+                / (sums["w"]*sums["xx"] - sums["x"]**2))
+            del sums
             # Eq. 3a. The flip angles have been corrected by the B1 map, but T1'
             # still includes the effects of the RF spoiling
             T1_prime = -repetition_time / numpy.log(SL)
         
         # Compute the RF-spoiling correction
-        pA, pB = VFA.rf_spoiling_correction_paremeters(
-            [x*rad for x in flip_angles], echo_time*s, repetition_time*s)
+        pA, pB = VFA.rf_spoiling_correction(
+            tuple(flip_angles), echo_time, repetition_time)
         
-        A = numpy.polyval(pA, B1_map)
-        B = numpy.polyval(pB, B1_map)
+        A = numpy.polyval(numpy.asarray(pA, dtype), B1_map)
+        B = numpy.polyval(numpy.asarray(pB, dtype), B1_map)
         T1 = A + B*T1_prime
         
         T1[T1<0] = numpy.nan
         T1[T1>10] = numpy.nan
-        nibabel.save(nibabel.Nifti1Image(T1, sources[0].affine), T1_map_path)
+        save(nibabel.Nifti1Image(T1, affine), T1_map_path)
+    
+    @staticmethod
+    @functools.lru_cache()
+    def rf_spoiling_correction(flip_angles, echo_time, repetition_time):
+        """ Return the RF-spoiling correction for the given protocol (flip 
+            angles in rad, times in s). The result only depends on the 
+            protocol: it is shared by all tasks of the same process, and 
+            cached on disk for the other processes.
+        """
+        
+        def compute():
+            pA, pB = VFA.rf_spoiling_correction_paremeters(
+                flip_angles, echo_time, repetition_time)
+            return {"pA": pA, "pB": pB}
+        
+        arrays = cache.cached_arrays(
+            "vfa_rf_spoiling",
+            {
+                # Version of the simulation: the tables of the previous
+                # versions are not re-used
+                "version": 2,
+                "flip_angles": [float(x) for x in flip_angles],
+                "echo_time": float(echo_time), 
+                "repetition_time": float(repetition_time)},
+            compute)
+        return arrays["pA"], arrays["pB"]
     
     @staticmethod
     def rf_spoiling_correction_paremeters(flip_angles, TE, TR):
@@ -79,12 +135,21 @@ class VFA(spire.TaskFactory):
             Magnetic Resonance in Medicine 61(1). 2009.
         """
         
-        phase_step_increment = 50*deg
+        phase_step_increment = numpy.radians(50)
         
         C_RF_range = numpy.arange(0.7, 1.3, 0.1)
         
-        T1_range = sycomore.linspace(0.6*s, 1.8*s, 20)
-        T2 = 80*ms
+        T1_range = numpy.linspace(0.6, 1.8, 20)
+        T2 = 80e-3
+        
+        flip_angles = numpy.asarray(flip_angles)
+        
+        # Simulate the signals for all the combinations of C_RF, T1 and flip
+        # angles at once.
+        signals = epg.simulate_spgr(
+            T1_range[None, :, None], T2,
+            C_RF_range[:, None, None]*flip_angles, phase_step_increment, TE, TR,
+            tolerance=1e-5)
         
         A = numpy.zeros(len(C_RF_range))
         B = numpy.zeros(len(C_RF_range))
@@ -94,29 +159,23 @@ class VFA(spire.TaskFactory):
             T1_app = numpy.zeros(len(T1_range))
             
             for i, T1 in enumerate(T1_range):
-                # Simulate the signals for all the flip angles.
-                signals = numpy.asarray([
-                    VFA.simulate_spgr(
-                        T1, T2, flip_angle*C_RF, phase_step_increment, TE, TR)
-                    for flip_angle in flip_angles])
-                
                 # Linear fit of S/α = A + B S⋅α (eq. 3)
                 X = numpy.zeros((len(flip_angles), 2))
                 X[:,0] = 1
-                X[:,1] = signals*[x.magnitude for x in flip_angles]
+                X[:,1] = signals[k, i]*flip_angles
                 
-                Y = signals/[x.magnitude for x in flip_angles]
+                Y = signals[k, i]/flip_angles
                 
                 intercept, slope = numpy.linalg.lstsq(X, Y, rcond=None)[0]
                 # Intercept is ρ, slope is -T1'/(2TR). Since T1' = T1⋅C_RF²,
                 # the slope is can be written as -T1⋅C_RF² / 2TR and thus
-                T1_app[i] = -slope * 2*TR.magnitude / C_RF**2
+                T1_app[i] = -slope * 2*TR / C_RF**2
             
             X = numpy.zeros((len(T1_app), 2))
             X[:,0] = 1
             # FIXME? shouldn't this be T1_apparent[:,k]
             X[:,1] = T1_app
-            Y = numpy.asarray([x.magnitude for x in T1_range]).reshape((-1, 1))
+            Y = T1_range
             intercept, slope = numpy.linalg.lstsq(X, Y, rcond=None)[0]
             A[k] = intercept
             B[k] = slope
@@ -127,9 +186,13 @@ class VFA(spire.TaskFactory):
     
     @staticmethod
     def simulate_spgr(T1, T2, flip_angle, phase_step_increment, TE, TR):
-        """ EPG simulation of the SPGR sequence.
+        """ EPG simulation of the SPGR sequence using sycomore (parameters as
+            quantities), kept as a reference for erwin.epg.simulate_spgr.
         """
         
+        import sycomore
+        from sycomore.units import mm, rad
+        
         # We just need a non-null value
         slice_thickness = 5*mm
         G_readout = (2*numpy.pi*rad / (sycomore.gamma*slice_thickness))/(TR-TE)
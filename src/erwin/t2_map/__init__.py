@@ -1,5 +1,9 @@
 """ T₂/R₂ mapping
 """
 
-from .bssfp import bSSFP
-from .pssfp import pSSFP
+from .. import lazy_import
+
+__getattr__, __dir__ = lazy_import(
+    __name__, {
+        "bSSFP": "bssfp",
+        "pSSFP": "pssfp"})
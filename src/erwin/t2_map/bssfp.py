@@ -2,7 +2,8 @@ import nibabel
 import numpy
 import spire
 
-from .. import entrypoint
+from .. import entrypoint, load, precision, save
+from ..slabs import SlabReader
 from ..cli import *
 
 class bSSFP(spire.TaskFactory):
@@ -35,59 +36,93 @@ class bSSFP(spire.TaskFactory):
             (
                 bSSFP.t2_map, (
                     sources, flip_angles, phase_increments, repetition_time,
-                    B1_map, T1_map, target))]
+                    B1_map, T1_map, target, precision.get_dtype()))]
     
     @staticmethod
     def t2_map(
             source_paths, flip_angles, phase_increments, repetition_time, 
-            B1_map_path, T1_map_path, T2_map_path):
+            B1_map_path, T1_map_path, T2_map_path, dtype="float64",
+            slab_size=2**22):
+        """ Compute the T2 map by slabs of about slab_size voxels along the
+            third axis. Only the images of one source are read at the same
+            time, and the work buffers are shared by all sources, so that the
+            memory does not depend on the number of sources. Compressed images
+            are read as streams, see SlabReader.
+        """
         
         # Sort images and meta-data according to the pair (ϕ, FA)
         # so that we get (ϕ₁, FA₁), (ϕ₁, FA₂), (ϕ₂, FA₁), (ϕ₂, FA₂), etc.
-        order = [
-            x[0] for x in sorted(
-                zip(range(len(source_paths)), phase_increments, flip_angles),
-                key=lambda x: (x[-2], x[-1]))]
-        for array in [source_paths, flip_angles, phase_increments]:
-            array[:] = [array[x] for x in order]
-        
-        # Load the images
-        sources = [nibabel.load(x) for x in source_paths]
-        rB1 = nibabel.load(B1_map_path).get_fdata()
-        
-        T1 = nibabel.load(T1_map_path).get_fdata()
-        T1[T1<0] = 1e-12
-        with numpy.errstate(divide="ignore", invalid="ignore"):
-            E1 = numpy.exp(-repetition_time/T1)[None, ...]
-        
-        S = numpy.asarray([source.get_fdata() for source in sources])
-        
-        alpha = numpy.asarray(flip_angles)[:, None, None, None] * rB1[None, :, :, :]
+        order = sorted(
+            range(len(source_paths)),
+            key=lambda x: (phase_increments[x], flip_angles[x]))
+        pairs = list(zip(order[0::2], order[1::2]))
         
-        sin_alpha = numpy.sin(alpha)
-        sin_alpha[sin_alpha == 0] = 1e-12
+        sources = [SlabReader(load(x)) for x in source_paths]
+        B1_map = SlabReader(load(B1_map_path))
+        T1_map = SlabReader(load(T1_map_path))
         
-        tan_alpha = numpy.tan(alpha)
-        tan_alpha[tan_alpha == 0] = 1e-12
-        
-        # Equation 7, regularized
-        numerator = S[0::2]/sin_alpha[0::2] - S[1::2]/sin_alpha[1::2]
-        denominator = S[0::2]/tan_alpha[0::2] - S[1::2]/tan_alpha[1::2]
-        denominator[denominator == 0] = 1e-12
-        m = numerator/denominator
-        
-        # Equation 4, WARNING complex data possible
-        with numpy.errstate(divide="ignore", invalid="ignore"):
-            tau_2 = -repetition_time / numpy.log((E1-m) / (1 - m*E1))
+        shape = sources[0].image.shape[:3]
+        slices_count = max(1, slab_size // int(numpy.prod(shape[:2])))
         
         # Below equation 11
-        K_N = numpy.sqrt(8/(3*len(source_paths)/2))
-        
-        # Equation 11
-        T2_RSS = K_N * numpy.sqrt(numpy.nansum(tau_2**2, axis=0))
-        
-        nibabel.save(
-            nibabel.Nifti1Image(T2_RSS, sources[0].affine),
+        K_N = float(numpy.sqrt(8/(3*len(source_paths)/2)))
+        
+        T2_RSS = numpy.empty(shape, dtype)
+        for start in range(0, shape[2], slices_count):
+            stop = start+slices_count
+            
+            rB1 = numpy.asarray(B1_map.read(start, stop), dtype)
+            
+            T1 = numpy.array(T1_map.read(start, stop), dtype)
+            T1[T1<0] = 1e-12
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                E1 = numpy.exp(-repetition_time/T1)
+            del T1
+            
+            sum_of_squares = numpy.zeros(rB1.shape, dtype)
+            numerator, denominator, work = [
+                numpy.empty(rB1.shape, dtype) for _ in range(3)]
+            for pair in pairs:
+                # Equation 7, regularized
+                numerator[:] = 0
+                denominator[:] = 0
+                for index, sign in zip(pair, [1, -1]):
+                    S = numpy.asarray(sources[index].read(start, stop), dtype)
+                    for function, accumulator in [
+                            (numpy.sin, numerator), (numpy.tan, denominator)]:
+                        numpy.multiply(rB1, flip_angles[index], out=work)
+                        function(work, out=work)
+                        work[work == 0] = 1e-12
+                        numpy.divide(S, work, out=work)
+                        if sign > 0:
+                            accumulator += work
+                        else:
+                            accumulator -= work
+                    del S
+                denominator[denominator == 0] = 1e-12
+                m = numpy.divide(numerator, denominator, out=numerator)
+                
+                # Equation 4, the logarithm of negative values is undefined
+                with numpy.errstate(divide="ignore", invalid="ignore"):
+                    numpy.multiply(m, E1, out=work)
+                    numpy.subtract(1, work, out=work)
+                    numpy.subtract(E1, m, out=denominator)
+                    numpy.divide(denominator, work, out=work)
+                    numpy.log(work, out=work)
+                    numpy.divide(-repetition_time, work, out=work)
+                
+                # Equation 11, ignoring the undefined values
+                numpy.square(work, out=work)
+                work[numpy.isnan(work)] = 0
+                sum_of_squares += work
+            
+            T2_RSS[:, :, start:stop] = K_N * numpy.sqrt(sum_of_squares)
+        
+        for reader in [*sources, B1_map, T1_map]:
+            reader.close()
+        
+        save(
+            nibabel.Nifti1Image(T2_RSS, sources[0].image.affine),
             T2_map_path)
 
 def main():
@@ -1,8 +1,11 @@
+import functools
+import logging
+
 import nibabel
 import numpy
 import spire
 
-from .. import entrypoint
+from .. import cache, entrypoint, load, precision, save
 from ..cli import *
 
 class pSSFP(spire.TaskFactory):
@@ -47,26 +50,27 @@ class pSSFP(spire.TaskFactory):
             (
                 pSSFP.t2_map, (
                     sources, flip_angle, phase_increments, repetition_time,
-                    B1_map, global_T1 if global_T1 else T1_map, target))]
+                    B1_map, global_T1 if global_T1 else T1_map, target,
+                    precision.get_dtype()))]
     
     @staticmethod
     def t2_map(
             source_paths, flip_angle, phase_increments, repetition_time,
-            B1_map_path, T1, T2_map_path):
+            B1_map_path, T1, T2_map_path, dtype="float64"):
 
-        sources = [nibabel.load(x) for x in source_paths]
-        B1 = nibabel.load(B1_map_path).get_fdata()
+        sources = [load(x) for x in source_paths]
+        B1 = load(B1_map_path).get_fdata(dtype=dtype)
 
         alpha = flip_angle*B1
         
         if not isinstance(T1, float):
-            T1 = nibabel.load(T1).get_fdata()
+            T1 = load(T1).get_fdata(dtype=dtype)
 
-        S = [x.get_fdata() for x in sources]
+        S = [x.get_fdata(dtype=dtype) for x in sources]
         S_sq = numpy.power(S, 2)
 
         eta = 0.5*(1+numpy.cos(alpha))/(1-numpy.cos(alpha))
-        xi = pSSFP.compute_xi(eta)
+        xi = pSSFP.interpolate_xi(eta).astype(dtype, copy=False)
         
         T2_biased = (
             2*repetition_time/xi * numpy.sqrt(
@@ -74,7 +78,7 @@ class pSSFP(spire.TaskFactory):
                 / (S_sq[1]*phase_increments[1]**2 - S_sq[0]*phase_increments[0]**2)))
         T2 = T2_biased / (1 - 3/2*(eta * T2_biased / T1))
 
-        nibabel.save(nibabel.Nifti1Image(T2, sources[0].affine), T2_map_path)
+        save(nibabel.Nifti1Image(T2, sources[0].affine), T2_map_path)
 
     @staticmethod
     def compute_xi(eta, N=20):
@@ -95,6 +99,60 @@ class pSSFP(spire.TaskFactory):
         for k in range(N, -1, -1):
             xi = (2*k + 1)*(eta + 1) - (eta * (k+1))**2 / xi
         return xi
+    
+    @staticmethod
+    def interpolate_xi(eta, tolerance=1e-8):
+        """ Interpolate the ξ factor of Ganter's paper (Eq. 34) given η, using
+            a table of the continued fraction evaluated at an order such that
+            its relative change is below tolerance.
+            
+            The table is defined for flip angles between 0.4° and 180°, i.e.
+            for 0 ≤ η ≤ 41034, and NaN is returned outside this range. The
+            interpolation is monotone, and its relative error is below 1e-8.
+        """
+        
+        interpolant = pSSFP.get_xi_interpolant(tolerance)
+        # x = sin²(α/2) = 1/(1+2η), where log(ξ) is smooth
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            return numpy.exp(interpolant(-numpy.log1p(2*eta)))
+    
+    @staticmethod
+    @functools.lru_cache()
+    def get_xi_interpolant(tolerance):
+        """ Return the monotone interpolant of log(ξ) as a function of
+            log(sin²(α/2)). The table is shared by all tasks of the same
+            process, and cached on disk for the other processes.
+        """
+        
+        import scipy.interpolate
+        
+        # Smallest flip angle (rad) and size of the table
+        minimum, size = numpy.radians(0.4), 512
+        
+        def compute():
+            logging.info("Computing the ξ table")
+            log_x = numpy.linspace(numpy.log(numpy.sin(minimum/2)**2), 0, size)
+            eta = 0.5*(1-numpy.exp(log_x))/numpy.exp(log_x)
+            
+            # Double the order until the continued fraction has converged
+            N = 20
+            xi = pSSFP.compute_xi(eta, N)
+            while True:
+                N *= 2
+                previous, xi = xi, pSSFP.compute_xi(eta, N)
+                if numpy.max(numpy.abs(xi-previous)/xi) < tolerance:
+                    break
+            
+            return {"log_x": log_x, "log_xi": numpy.log(xi)}
+        
+        table = cache.cached_arrays(
+            "pssfp_xi",
+            {
+                "tolerance": float(tolerance), "minimum": float(minimum),
+                "size": size},
+            compute)
+        return scipy.interpolate.PchipInterpolator(
+            table["log_x"], table["log_xi"], extrapolate=False)
 
 def main():
     return entrypoint(
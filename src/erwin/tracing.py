@@ -0,0 +1,171 @@
+import json
+import os
+import sys
+import time
+
+class Recorder(object):
+    """ Record the wall time, CPU time, peak resident memory and I/O of a
+        block of code, as an event of the Chrome trace format.
+
+        The peak memory is reset at the start of the block when the system
+        allows it (Linux ≥ 4.0); otherwise it is the peak memory of the process
+        since its start. It is None if the system does not provide it (e.g.
+        Windows).
+
+        The system only provides the largest peak memory of all the children
+        terminated since the start of the process. The peak memory of the
+        children is then only known if a child of the block exceeded this
+        value, and is None otherwise.
+    """
+
+    def __init__(self, name, category, task=None, reset=True):
+        """ :param name: Name of the event
+            :param category: Category of the event, e.g. "task" or "action"
+            :param task: Name of the task the event belongs to
+            :param reset: Reset the peak memory when entering the block
+        """
+
+        self.name = name
+        self.category = category
+        self.task = task
+        self.reset = reset
+        self.event = None
+
+    def __enter__(self):
+        if self.reset:
+            reset_peak_memory()
+        self._start = get_resources()
+        return self
+
+    def __exit__(self, *args):
+        stop = get_resources()
+        children_peak_memory = stop["children_peak_memory"]
+        if children_peak_memory == self._start["children_peak_memory"]:
+            children_peak_memory = None
+        delta = {
+            x: stop[x] - self._start[x]
+            for x in [
+                "cpu_time", "children_cpu_time", "read_bytes",
+                "written_bytes"]}
+        self.event = {
+            "name": self.name, "cat": self.category, "ph": "X",
+            "ts": 1e6*self._start["time"],
+            "dur": 1e6*(stop["time"]-self._start["time"]),
+            "pid": os.getpid(), "tid": 0,
+            "args": {
+                "task": self.task, **delta,
+                "peak_memory": stop["peak_memory"],
+                "children_peak_memory": children_peak_memory}}
+
+def get_resources():
+    """ Return the current resources usage of the process and of its
+        terminated children.
+    """
+
+    try:
+        import resource
+    except ImportError:
+        # NOTE: the resource module is not available on Windows
+        resource = None
+
+    if resource is not None:
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_time = self_usage.ru_utime + self_usage.ru_stime
+        children_cpu_time = children_usage.ru_utime + children_usage.ru_stime
+        children_peak_memory = get_max_rss(children_usage)
+    else:
+        self_usage = None
+        cpu_time, children_cpu_time = time.process_time(), 0
+        children_peak_memory = None
+
+    peak_memory = None
+    try:
+        with open("/proc/self/status") as fd:
+            for line in fd:
+                if line.startswith("VmHWM:"):
+                    peak_memory = 1024*int(line.split()[1])
+    except OSError:
+        pass
+    if peak_memory is None and self_usage is not None:
+        peak_memory = get_max_rss(self_usage)
+
+    read_bytes, written_bytes = 0, 0
+    try:
+        with open("/proc/self/io") as fd:
+            io = dict(line.split(":") for line in fd)
+        read_bytes, written_bytes = int(io["rchar"]), int(io["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+
+    return {
+        "time": time.time(),
+        "cpu_time": cpu_time, "children_cpu_time": children_cpu_time,
+        "peak_memory": peak_memory,
+        "children_peak_memory": children_peak_memory,
+        "read_bytes": read_bytes, "written_bytes": written_bytes}
+
+def get_max_rss(usage):
+    """ Return the maximum resident set size of a resource usage, in bytes.
+    """
+
+    # NOTE: ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    return usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+def reset_peak_memory():
+    """ Reset the peak resident memory of the process, if possible.
+    """
+
+    try:
+        with open("/proc/self/clear_refs", "w") as fd:
+            fd.write("5")
+    except OSError:
+        pass
+
+def get_peak_memory(args):
+    """ Return the printable peak memory (MiB) of the process and of its
+        children in the arguments of an event.
+    """
+
+    values = [
+        x for x in [args["peak_memory"], args["children_peak_memory"]]
+        if x is not None]
+    return "{:.0f}".format(max(values)/2**20) if values else "n/a"
+
+def write(events, path):
+    """ Write the events in the Chrome trace format, which can be opened in
+        Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+    """
+
+    with open(path, "w") as fd:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fd)
+
+def get_summary(events):
+    """ Return a summary table of the task events.
+    """
+
+    header = [
+        "Task", "Wall (s)", "CPU (s)", "Child CPU (s)", "Peak mem. (MiB)",
+        "Read (MiB)", "Written (MiB)"]
+    rows = []
+    for event in events:
+        if event["cat"] != "task":
+            continue
+        args = event["args"]
+        rows.append([
+            event["name"],
+            "{:.2f}".format(1e-6*event["dur"]),
+            "{:.2f}".format(args["cpu_time"]),
+            "{:.2f}".format(args["children_cpu_time"]),
+            get_peak_memory(args),
+            "{:.1f}".format(args["read_bytes"]/2**20),
+            "{:.1f}".format(args["written_bytes"]/2**20)])
+
+    widths = [max(len(x) for x in column) for column in zip(header, *rows)]
+    lines = [
+        "  ".join(
+            x.ljust(w) if index == 0 else x.rjust(w)
+            for index, (x, w) in enumerate(zip(row, widths)))
+        for row in [header, *rows]]
+    lines.insert(1, "-"*len(lines[0]))
+    return "\n".join(lines)
@@ -0,0 +1,245 @@
+""" Benchmarks of the voxelwise methods on a synthetic phantom, for asv
+    (https://asv.readthedocs.io). Each method is timed (time_run) and its peak
+    memory is measured (peakmem_run) for several matrix sizes, and for several
+    numbers of volumes for the time series.
+
+    The phantom data are created once per benchmark class by setup_cache, so
+    that neither their creation time nor their memory is included in the
+    measures.
+"""
+
+import abc
+import itertools
+import os
+
+import numpy
+
+import erwin
+from .phantom import Phantom
+
+class _Method(abc.ABC):
+    params = [[64, 128, 256]]
+    param_names = ["size"]
+    timeout = 3600
+
+    def setup_cache(self):
+        directory = os.path.abspath("phantom")
+        for parameters in itertools.product(*self.params):
+            path = os.path.join(directory, get_name(parameters))
+            os.makedirs(path, exist_ok=True)
+            self.create(path, *parameters)
+        return directory
+
+    def setup(self, directory, *parameters):
+        self.task = self.get_task(
+            os.path.join(directory, get_name(parameters)), *parameters)
+
+    def time_run(self, directory, *parameters):
+        erwin.run([self.task])
+
+    def peakmem_run(self, directory, *parameters):
+        erwin.run([self.task])
+
+    @abc.abstractmethod
+    def create(self, directory, *parameters):
+        """ Create the phantom data in the directory.
+        """
+
+    @abc.abstractmethod
+    def get_task(self, directory, *parameters):
+        """ Return the task running on the phantom data of the directory.
+        """
+
+class DoubleEcho(_Method):
+    echo_times = [4e-3, 8e-3]
+
+    def create(self, directory, size):
+        phantom = Phantom(size)
+        magnitudes, phases = phantom.multi_echo(self.echo_times)
+        for index, (magnitude, phase) in enumerate(zip(magnitudes, phases)):
+            phantom.save(magnitude, get_path(directory, "magnitude", index))
+            phantom.save(phase, get_path(directory, "phase", index))
+
+    def get_task(self, directory, size):
+        return erwin.b0_map.DoubleEcho(
+            [get_path(directory, "magnitude", x) for x in range(2)],
+            [get_path(directory, "phase", x) for x in range(2)],
+            self.echo_times, get_path(directory, "B0"))
+
+class AFI(_Method):
+    flip_angle = numpy.radians(60)
+    repetition_time = 20e-3
+    tr_ratio = 5
+
+    def create(self, directory, size):
+        phantom = Phantom(size)
+        signals = phantom.afi(
+            self.flip_angle, self.repetition_time, self.tr_ratio)
+        for index, signal in enumerate(signals):
+            phantom.save(signal, get_path(directory, "AFI", index))
+
+    def get_task(self, directory, size):
+        return erwin.b1_map.AFI(
+            [get_path(directory, "AFI", x) for x in range(2)],
+            self.flip_angle, self.tr_ratio, get_path(directory, "B1"))
+
+class VFA(_Method):
+    flip_angles = numpy.radians([4, 20]).tolist()
+    echo_time = 2.5e-3
+    repetition_time = 15e-3
+
+    def create(self, directory, size):
+        phantom = Phantom(size)
+        for index, flip_angle in enumerate(self.flip_angles):
+            phantom.save(
+                phantom.spgr(flip_angle, self.repetition_time, self.echo_time),
+                get_path(directory, "VFA", index))
+        phantom.save(phantom.B1, get_path(directory, "B1"))
+
+    def get_task(self, directory, size):
+        return erwin.t1_map.VFA(
+            [get_path(directory, "VFA", x) for x in range(2)],
+            self.flip_angles, self.echo_time, self.repetition_time,
+            get_path(directory, "B1"), get_path(directory, "T1"))
+
+class MTR(_Method):
+    def create(self, directory, size):
+        phantom = Phantom(size)
+        MT_off, MT_on = phantom.mt(numpy.radians(10), 30e-3)
+        phantom.save(MT_off, get_path(directory, "MT_off"))
+        phantom.save(MT_on, get_path(directory, "MT_on"))
+
+    def get_task(self, directory, size):
+        return erwin.mt_map.MTR(
+            get_path(directory, "MT_off"), get_path(directory, "MT_on"),
+            get_path(directory, "MTR"))
+
+class SinglePoint(_Method):
+    flip_angle = numpy.radians(10)
+    repetition_time = 30e-3
+
+    def create(self, directory, size):
+        phantom = Phantom(size)
+        MT_off, MT_on = phantom.mt(self.flip_angle, self.repetition_time)
+        phantom.save(MT_off, get_path(directory, "MT_off"))
+        phantom.save(MT_on, get_path(directory, "MT_on"))
+        phantom.save(phantom.B0, get_path(directory, "B0"))
+        phantom.save(phantom.B1, get_path(directory, "B1"))
+        phantom.save(phantom.T1, get_path(directory, "T1"))
+
+    def get_task(self, directory, size):
+        return erwin.mt_map.SinglePoint(
+            get_path(directory, "MT_off"), get_path(directory, "MT_on"),
+            numpy.radians(560), 12e-3, 4000,
+            self.flip_angle, self.repetition_time,
+            get_path(directory, "B0"), get_path(directory, "B1"),
+            get_path(directory, "T1"), get_path(directory, "MPF"))
+
+class bSSFP(_Method):
+    flip_angles = numpy.radians([15, 50]).tolist()
+    phase_increments = numpy.radians([0, 90, 180, 270]).tolist()
+    repetition_time = 5e-3
+
+    def create(self, directory, size):
+        phantom = Phantom(size)
+        for index, (flip_angle, phase_increment) in enumerate(
+                self.get_protocol()):
+            phantom.save(
+                phantom.bssfp(
+                    flip_angle, phase_increment, self.repetition_time),
+                get_path(directory, "bSSFP", index))
+        phantom.save(phantom.B1, get_path(directory, "B1"))
+        phantom.save(phantom.T1, get_path(directory, "T1"))
+
+    def get_task(self, directory, size):
+        protocol = self.get_protocol()
+        return erwin.t2_map.bSSFP(
+            [get_path(directory, "bSSFP", x) for x in range(len(protocol))],
+            [x[0] for x in protocol], [x[1] for x in protocol],
+            self.repetition_time,
+            get_path(directory, "B1"), get_path(directory, "T1"),
+            get_path(directory, "T2"))
+
+    def get_protocol(self):
+        return list(itertools.product(self.flip_angles, self.phase_increments))
+
+class pSSFP(_Method):
+    flip_angle = numpy.radians(40)
+    phase_increments = numpy.radians([1, 10]).tolist()
+    repetition_time = 10e-3
+
+    def create(self, directory, size):
+        phantom = Phantom(size)
+        signals = phantom.pssfp(
+            self.flip_angle, self.phase_increments, self.repetition_time,
+            erwin.t2_map.pSSFP.interpolate_xi)
+        for index, signal in enumerate(signals):
+            phantom.save(signal, get_path(directory, "pSSFP", index))
+        phantom.save(phantom.B1, get_path(directory, "B1"))
+        phantom.save(phantom.T1, get_path(directory, "T1"))
+
+    def get_task(self, directory, size):
+        return erwin.t2_map.pSSFP(
+            [get_path(directory, "pSSFP", x) for x in range(2)],
+            self.flip_angle, self.phase_increments, self.repetition_time,
+            get_path(directory, "B1"), get_path(directory, "T1"),
+            get_path(directory, "T2"))
+
+class pASL(_Method):
+    # Number of control and label volumes, in addition to the M0 volume
+    params = [[64, 128], [30, 300]]
+    param_names = ["size", "volumes"]
+    repetition_time = 3
+
+    def create(self, directory, size, volumes):
+        phantom = Phantom(size)
+        phantom.save(
+            phantom.asl(1+volumes, self.repetition_time),
+            get_path(directory, "ASL"), numpy.int16)
+        phantom.save(
+            phantom.slice_time(1+volumes, 40e-3),
+            get_path(directory, "slice_time"))
+
+    def get_task(self, directory, size, volumes):
+        return erwin.cbf.pASL(
+            get_path(directory, "ASL"), 12e-3, [0.7, 1.8],
+            get_path(directory, "slice_time"), get_path(directory, "CBF"))
+
+class ASLBOLDToASL(_Method):
+    params = [[64, 128], [30, 300]]
+    param_names = ["size", "volumes"]
+    repetition_time = 3
+
+    def create(self, directory, size, volumes):
+        phantom = Phantom(size)
+        phantom.save(
+            phantom.asl(1+volumes, self.repetition_time),
+            get_path(directory, "ASL_BOLD"), numpy.int16)
+
+    def get_task(self, directory, size, volumes):
+        return erwin.cbf.ASLBOLDToASL(
+            get_path(directory, "ASL_BOLD"), self.repetition_time,
+            get_path(directory, "ASL"))
+
+class TimeToRate(_Method):
+    def create(self, directory, size):
+        phantom = Phantom(size)
+        phantom.save(phantom.T1, get_path(directory, "T1"))
+
+    def get_task(self, directory, size):
+        return erwin.misc.TimeToRate(
+            get_path(directory, "T1"), get_path(directory, "R1"))
+
+def get_name(parameters):
+    """ Return the name of the directory of a parameter set.
+    """
+
+    return "_".join(str(x) for x in parameters)
+
+def get_path(directory, name, index=None):
+    """ Return the path to an image of the phantom data.
+    """
+
+    if index is not None:
+        name = "{}_{}".format(name, index)
+    return os.path.join(directory, "{}.nii".format(name))
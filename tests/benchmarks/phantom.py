@@ -0,0 +1,168 @@
+import os
+
+import nibabel
+import numpy
+
+class Phantom(object):
+    """ Synthetic head phantom: nested ellipsoids of CSF, white matter and gray
+        matter in air, with smooth B₀ and B₁ fields. The phantom and the
+        signals derived from it are deterministic, so that all benchmarks of a
+        given size use the same inputs.
+    """
+
+    # T1 (s), T2 (s), T2* (s), proton density, macromolecular proton fraction
+    tissues = {
+        "background": (numpy.nan, numpy.nan, numpy.nan, 0, 0),
+        "csf": (4.0, 2.0, 1.0, 1.0, 0.0),
+        "white_matter": (0.85, 0.07, 0.05, 0.7, 0.12),
+        "gray_matter": (1.4, 0.1, 0.06, 0.8, 0.06),
+    }
+
+    def __init__(self, size, seed=0):
+        """ :param size: Number of voxels along each axis
+            :param seed: Seed of the random noise
+        """
+
+        self.shape = (size, size, size)
+        self.affine = numpy.diag([256/size, 256/size, 256/size, 1])
+        self.random = numpy.random.default_rng(seed)
+
+        x, y, z = numpy.meshgrid(
+            *[numpy.linspace(-1, 1, size)]*3, indexing="ij", sparse=True)
+        r = numpy.sqrt((x/0.7)**2 + (y/0.85)**2 + (z/0.8)**2)
+
+        labels = numpy.zeros(self.shape, int)
+        labels[r < 0.95] = 3
+        labels[r < 0.7] = 2
+        labels[r < 0.2] = 1
+
+        names = ["background", "csf", "white_matter", "gray_matter"]
+        parameters = numpy.array([self.tissues[x] for x in names])
+        self.T1, self.T2, self.T2_star, self.PD, self.MPF = [
+            parameters[labels, x] for x in range(parameters.shape[1])]
+        self.mask = labels != 0
+
+        # Smooth fields: ΔB₀ in Hz, relative B₁
+        self.B0 = 40*x + 20*y**2 - 15*z*x + numpy.zeros(self.shape)
+        self.B1 = 1.1 - 0.25*(x**2 + y**2 + z**2) + numpy.zeros(self.shape)
+
+    def noise(self, level=0.01, shape=None):
+        """ Gaussian noise relative to the maximal proton density.
+        """
+
+        return level * self.random.standard_normal(
+            shape or self.shape, numpy.float32)
+
+    def save(self, array, path, dtype=numpy.float32):
+        """ Save an array using the affine of the phantom, replacing NaN by 0.
+        """
+
+        array = numpy.nan_to_num(array).astype(dtype)
+        nibabel.save(nibabel.Nifti1Image(array, self.affine), path)
+        return os.path.abspath(path)
+
+    def spgr(self, flip_angle, repetition_time, echo_time=0):
+        """ Steady-state signal of a spoiled gradient echo.
+        """
+
+        alpha = flip_angle * self.B1
+        with numpy.errstate(invalid="ignore"):
+            E1 = numpy.exp(-repetition_time/self.T1)
+            signal = (
+                self.PD * numpy.sin(alpha) * (1-E1) / (1-E1*numpy.cos(alpha))
+                * numpy.exp(-echo_time/self.T2_star))
+        return numpy.nan_to_num(signal) + self.noise()
+
+    def afi(self, flip_angle, repetition_time, tr_ratio):
+        """ Signals of the two TR of an AFI sequence.
+        """
+
+        alpha = flip_angle * self.B1
+        with numpy.errstate(invalid="ignore"):
+            E1 = numpy.exp(-repetition_time/self.T1)
+            E2 = numpy.exp(-tr_ratio*repetition_time/self.T1)
+            denominator = 1 - E1*E2*numpy.cos(alpha)**2
+            signals = [
+                self.PD * numpy.sin(alpha)
+                    * (1 - E2 + (1-E1)*E2*numpy.cos(alpha)) / denominator,
+                self.PD * numpy.sin(alpha)
+                    * (1 - E1 + (1-E2)*E1*numpy.cos(alpha)) / denominator]
+        return [numpy.nan_to_num(x) + self.noise() for x in signals]
+
+    def multi_echo(self, echo_times):
+        """ Magnitude and phase (rad) of a multi-echo gradient echo.
+        """
+
+        magnitudes, phases = [], []
+        for echo_time in echo_times:
+            with numpy.errstate(invalid="ignore"):
+                magnitude = self.PD * numpy.exp(-echo_time/self.T2_star)
+            magnitudes.append(numpy.nan_to_num(magnitude) + self.noise())
+            phase = 2*numpy.pi*self.B0*echo_time + 0.3
+            phases.append(numpy.angle(numpy.exp(1j*phase)))
+        return magnitudes, phases
+
+    def mt(self, flip_angle, repetition_time):
+        """ Signals without and with MT saturation.
+        """
+
+        MT_off = self.spgr(flip_angle, repetition_time)
+        MT_on = MT_off * (1 - 2.5*self.MPF*self.B1**2)
+        return MT_off, MT_on
+
+    def bssfp(self, flip_angle, phase_increment, repetition_time):
+        """ Approximate magnitude of a phase-cycled bSSFP signal.
+        """
+
+        alpha = flip_angle * self.B1
+        with numpy.errstate(invalid="ignore"):
+            E1 = numpy.exp(-repetition_time/self.T1)
+            E2 = numpy.exp(-repetition_time/self.T2)
+            signal = (
+                self.PD * numpy.sin(alpha) * (1-E1)
+                / (1 - (E1-E2)*numpy.cos(alpha) - E1*E2))
+        theta = phase_increment + 2*numpy.pi*self.B0*repetition_time
+        signal = signal * (1 + 0.1*numpy.cos(theta))
+        return numpy.nan_to_num(signal) + self.noise()
+
+    def pssfp(self, flip_angle, phase_increments, repetition_time, xi):
+        """ Partially-spoiled SSFP signals, consistent with the model of
+            erwin.t2_map.pSSFP for small phase increments.
+
+            :param xi: function computing ξ from η
+        """
+
+        alpha = flip_angle * self.B1
+        eta = 0.5*(1+numpy.cos(alpha))/(1-numpy.cos(alpha))
+        a = (xi(eta) * self.T2 / (2*repetition_time))**2
+        signals = []
+        for phase_increment in phase_increments:
+            with numpy.errstate(invalid="ignore"):
+                signal = self.PD / numpy.sqrt(1 + a*phase_increment**2)
+            signals.append(numpy.nan_to_num(signal) + self.noise())
+        return signals
+
+    def asl(self, volumes, repetition_time, scale=1000):
+        """ Pulsed ASL series: M0, then alternating control and label volumes,
+            with a slow BOLD-like fluctuation. The series is stored as 16-bits
+            integers, as in scanner data.
+        """
+
+        series = numpy.empty(self.shape+(volumes,), numpy.int16)
+        series[..., 0] = scale * self.PD
+        time = repetition_time*numpy.arange(volumes)
+        fluctuation = 1 + 0.01*numpy.sin(2*numpy.pi*0.02*time)
+        for index in range(1, volumes):
+            control = 0.9 * self.PD * fluctuation[index]
+            if index % 2 == 0:
+                control = control * (1 - 0.01*self.mask)
+            series[..., index] = scale * (control + self.noise())
+        return series
+
+    def slice_time(self, volumes, slice_duration):
+        """ Acquisition time of each slice, relative to the first one.
+        """
+
+        slice_time = slice_duration*numpy.arange(self.shape[2], dtype=float)
+        return numpy.broadcast_to(
+            slice_time[None, None, :, None], self.shape+(volumes,))
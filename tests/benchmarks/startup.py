@@ -0,0 +1,43 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+commands = {
+    "import erwin": [sys.executable, "-c", "import erwin"],
+    "meta_data.get": [sys.executable, "-m", "erwin", "meta_data.get", "--help"],
+    "misc.time_to_rate": [
+        sys.executable, "-m", "erwin", "misc.time_to_rate", "--help"],
+    "t1_map.vfa": [sys.executable, "-m", "erwin", "t1_map.vfa", "--help"],
+    "--list": [sys.executable, "-m", "erwin", "--list"],
+}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the start-up time of erwin")
+    parser.add_argument(
+        "--repeat", "-r", type=int, default=10,
+        help="Number of runs of each command")
+    parser.add_argument(
+        "commands", nargs="*",
+        help="Commands to run, in {} (default: all)".format(
+            ", ".join(commands)))
+    arguments = parser.parse_args()
+    unknown = set(arguments.commands) - set(commands)
+    if unknown:
+        parser.error("Unknown commands: {}".format(", ".join(unknown)))
+    
+    for name in arguments.commands or commands:
+        durations = []
+        for _ in range(arguments.repeat):
+            start = time.perf_counter()
+            subprocess.check_call(
+                commands[name], stdout=subprocess.DEVNULL)
+            durations.append(time.perf_counter() - start)
+        print(
+            "{:<20} median {:.3f} s, min {:.3f} s".format(
+                name, statistics.median(durations), min(durations)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import nibabel
+import numpy
+
+import erwin
+
+class TestMultiEcho(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+        random = numpy.random.default_rng(0)
+        shape = (6, 7, 8)
+        self.B0 = random.uniform(-100, 100, shape)
+        phase_0 = random.uniform(-numpy.pi, numpy.pi, shape)
+        magnitude = random.uniform(0.5, 1, shape)
+        
+        self.echo_times = [3e-3, 5e-3, 7e-3, 9e-3]
+        self.magnitude, self.phase = [], []
+        for index, echo_time in enumerate(self.echo_times):
+            phase = numpy.angle(
+                numpy.exp(1j*(phase_0 + 2*numpy.pi*self.B0*echo_time)))
+            for name, data, paths in [
+                    ("magnitude", magnitude, self.magnitude),
+                    ("phase", phase, self.phase)]:
+                path = os.path.join(
+                    self.directory, "{}_{}.nii".format(name, index))
+                nibabel.save(nibabel.Nifti1Image(data, numpy.eye(4)), path)
+                paths.append(path)
+        
+        self.target = os.path.join(self.directory, "B0.nii")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_fit(self):
+        # Small slabs, not aligned on the image
+        erwin.b0_map.MultiEcho.b0_map(
+            self.magnitude, self.phase, self.echo_times, self.target,
+            slab_size=3*6*7)
+        B0 = nibabel.load(self.target).get_fdata()
+        numpy.testing.assert_allclose(B0, self.B0, atol=1e-3)
+    
+    def test_precision(self):
+        # The complex signals are in complex64, the result in the requested
+        # precision
+        S = erwin.b0_map.MultiEcho.get_signal(
+            numpy.ones((2, 3, 4)), numpy.full((2, 3, 4), numpy.pi/2))
+        self.assertEqual(S.dtype, numpy.complex64)
+        numpy.testing.assert_allclose(S, 1j, atol=1e-6)
+        
+        for dtype in ["float32", "float64"]:
+            erwin.b0_map.MultiEcho.b0_map(
+                self.magnitude, self.phase, self.echo_times, self.target,
+                dtype)
+            self.assertEqual(nibabel.load(self.target).get_data_dtype(), dtype)
+    
+    def test_compressed(self):
+        # Compressed images are read as streams
+        magnitude, phase = [
+            [self._compress(x) for x in paths]
+            for paths in [self.magnitude, self.phase]]
+        erwin.b0_map.MultiEcho.b0_map(
+            magnitude, phase, self.echo_times, self.target, slab_size=3*6*7)
+        B0 = nibabel.load(self.target).get_fdata()
+        numpy.testing.assert_allclose(B0, self.B0, atol=1e-3)
+    
+    def test_double_echo(self):
+        erwin.run([
+            erwin.b0_map.MultiEcho(
+                self.magnitude[:2], self.phase[:2], self.echo_times[:2],
+                self.target),
+            erwin.b0_map.DoubleEcho(
+                self.magnitude[:2], self.phase[:2], self.echo_times[:2],
+                os.path.join(self.directory, "double_echo.nii"))])
+        
+        multi_echo = nibabel.load(self.target).get_fdata()
+        double_echo = nibabel.load(
+            os.path.join(self.directory, "double_echo.nii")).get_fdata()
+        numpy.testing.assert_allclose(multi_echo, double_echo, atol=1e-3)
+    
+    def test_mismatch(self):
+        with self.assertRaises(Exception):
+            erwin.b0_map.MultiEcho(
+                self.magnitude, self.phase[:2], self.echo_times, self.target)
+    
+    def _compress(self, path):
+        image = nibabel.load(path)
+        compressed = path.replace(".nii", ".nii.gz")
+        nibabel.save(
+            nibabel.Nifti1Image(image.get_fdata(), image.affine), compressed)
+        return compressed
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import nibabel
+import numpy
+
+import erwin
+from erwin import epg
+from erwin.b1_map.afi import AFI
+
+class TestAFI(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+        environment = unittest.mock.patch.dict(
+            os.environ, {"ERWIN_CACHE": os.path.join(self.directory, "cache")})
+        environment.start()
+        self.addCleanup(environment.stop)
+        
+        AFI.get_lookup_table.cache_clear()
+        self.addCleanup(AFI.get_lookup_table.cache_clear)
+        
+        self.flip_angle = numpy.radians(60)
+        self.tr_ratio, self.repetition_time = 5, 20e-3
+        self.phase_increment = numpy.radians(129.3)
+        
+        self.B1 = numpy.linspace(0.5, 1.5, 24).reshape(2, 3, 4)
+        self.sources = [
+            os.path.join(self.directory, "{}.nii".format(x)) for x in [1, 2]]
+        self.target = os.path.join(self.directory, "B1.nii")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_ideal(self):
+        # The closed form is a first-order approximation in TR/T1
+        self._save(1e-4)
+        erwin.run([
+            AFI(self.sources, self.flip_angle, self.tr_ratio, self.target)])
+        numpy.testing.assert_allclose(
+            nibabel.load(self.target).get_fdata(), self.B1, rtol=1e-2)
+    
+    def test_simulated(self):
+        # Signals simulated with the T2 and in the T1 range of the lookup
+        # table
+        self._save(50e-3)
+        erwin.run([
+            AFI(
+                self.sources, self.flip_angle, self.tr_ratio, self.target,
+                "simulated", self.repetition_time, self.phase_increment)])
+        numpy.testing.assert_allclose(
+            nibabel.load(self.target).get_fdata(), self.B1, rtol=2e-3)
+    
+    def test_missing_repetition_time(self):
+        with self.assertRaises(Exception):
+            AFI(
+                self.sources, self.flip_angle, self.tr_ratio, self.target,
+                "simulated")
+    
+    def _save(self, T2):
+        signals = epg.simulate_afi(
+            1, T2, self.B1*self.flip_angle, self.phase_increment,
+            self.repetition_time, self.tr_ratio, 600, 200)
+        for signal, path in zip(signals, self.sources):
+            nibabel.save(nibabel.Nifti1Image(signal, numpy.eye(4)), path)
+
+if __name__ == "__main__":
+    unittest.main()
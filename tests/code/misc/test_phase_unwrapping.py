@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import nibabel
+import numpy
+
+import erwin
+from erwin.misc.phase_unwrapping import PhaseUnwrapping
+
+class TestPhaseUnwrapping(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+        x, y, z = numpy.meshgrid(
+            *[numpy.linspace(-1, 1, n) for n in [32, 40, 24]], indexing="ij")
+        self.phase = 6*x**2 + 4*y*z + 3*z + 3*numpy.exp(-4*(x**2+y**2))
+        self.wrapped = numpy.angle(numpy.exp(1j*self.phase))
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_unwrap(self):
+        self._check(PhaseUnwrapping.unwrap(self.wrapped), self.phase)
+    
+    def test_task(self):
+        source = os.path.join(self.directory, "wrapped.nii")
+        target = os.path.join(self.directory, "unwrapped.nii")
+        nibabel.save(
+            nibabel.Nifti1Image(
+                numpy.stack([self.wrapped, -self.wrapped], -1),
+                numpy.diag([1, 1, 2, 1])),
+            source)
+        erwin.run([erwin.misc.PhaseUnwrapping(source, target)])
+        
+        unwrapped = nibabel.load(target).get_fdata()
+        self._check(unwrapped[..., 0], self.phase)
+        self._check(unwrapped[..., 1], -self.phase)
+    
+    def test_double_echo(self):
+        random = numpy.random.default_rng(0)
+        echo_times = [4e-3, 8e-3]
+        B0 = self.phase / (2*numpy.pi*(echo_times[1]-echo_times[0]))
+        phase_0 = random.uniform(-numpy.pi, numpy.pi, B0.shape)
+        
+        magnitude, phase = [], []
+        for index, echo_time in enumerate(echo_times):
+            for name, data, paths in [
+                    ("magnitude", numpy.ones(B0.shape), magnitude),
+                    (
+                        "phase",
+                        numpy.angle(
+                            numpy.exp(1j*(phase_0+2*numpy.pi*B0*echo_time))),
+                        phase)]:
+                path = os.path.join(
+                    self.directory, "{}_{}.nii".format(name, index))
+                nibabel.save(nibabel.Nifti1Image(data, numpy.eye(4)), path)
+                paths.append(path)
+        
+        target = os.path.join(self.directory, "B0.nii")
+        erwin.run([
+            erwin.b0_map.DoubleEcho(
+                magnitude, phase, echo_times, target, unwrap=True,
+                threads=1)])
+        self._check(
+            2*numpy.pi*(echo_times[1]-echo_times[0])
+                * nibabel.load(target).get_fdata(),
+            self.phase)
+    
+    def _check(self, unwrapped, phase):
+        # The unwrapped phase is defined up to a multiple of 2π
+        difference = unwrapped - phase
+        offset = 2*numpy.pi*numpy.round(difference.mean()/(2*numpy.pi))
+        numpy.testing.assert_allclose(difference, offset, atol=1e-6)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+import warnings
+
+import nibabel
+import numpy
+import scipy.integrate
+import scipy.optimize
+
+from erwin.mt_map.single_point import SinglePoint, mpf
+
+class TestSinglePoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+        environment = unittest.mock.patch.dict(
+            os.environ, {"ERWIN_CACHE": os.path.join(self.directory, "cache")})
+        environment.start()
+        self.addCleanup(environment.stop)
+        
+        SinglePoint.super_lorentzian_lineshapes.cache_clear()
+        self.addCleanup(SinglePoint.super_lorentzian_lineshapes.cache_clear)
+        
+        random = numpy.random.default_rng(0)
+        size = 2500
+        
+        T1 = random.uniform(0.7, 1.6, size)
+        self.f = random.uniform(0.02, 0.2, size)
+        
+        self.parameters = [
+            1/T1, 0.022*T1, 4000 - random.uniform(-100, 100, size),
+            random.uniform(0.8, 1.2, size) 
+                * SinglePoint.omega_1_rms_gaussian_pulse(
+                    12e-3, numpy.radians(560)),
+            random.uniform(1.3e-5, 1.7e-5, size),
+            30e-3, 12e-3, numpy.radians(10)]
+        self.S_ratio = -SinglePoint.model(self.f, 0, *self.parameters)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_lineshape(self):
+        T2_bound = 11e-6
+        offsets = numpy.array([-4000.5, 4000.5, 0.25, 1234.75, 2e4])
+        G = SinglePoint.get_lineshape(offsets, T2_bound)
+        for offset, value in zip(offsets, G):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                integral, _ = scipy.integrate.quad(
+                    mpf.super_lorentzian_differential, 0, 1, 
+                    (abs(offset), T2_bound), limit=150)
+            numpy.testing.assert_allclose(
+                value, T2_bound * numpy.sqrt(2/numpy.pi) * integral, 
+                rtol=1e-5)
+        
+        self.assertTrue(numpy.isnan(SinglePoint.get_lineshape(
+            [numpy.nan], T2_bound)).all())
+    
+    def test_model(self):
+        # NOTE: the Cython model uses single-precision floats
+        for index in range(len(self.f)):
+            expected = mpf.model(
+                self.f[index], 0.5, *[
+                    x[index] if numpy.ndim(x) else x 
+                    for x in self.parameters])
+            numpy.testing.assert_allclose(
+                SinglePoint.model(
+                    self.f[index], 0.5, *[
+                        x[index] if numpy.ndim(x) else x 
+                        for x in self.parameters]),
+                expected, atol=1e-6)
+    
+    def test_model_batch(self):
+        for threads in [1, 2]:
+            numpy.testing.assert_allclose(
+                mpf.model_batch(
+                    self.f, self.S_ratio, *self.parameters, threads=threads),
+                SinglePoint.model(self.f, self.S_ratio, *self.parameters),
+                atol=1e-12)
+    
+    def test_find_roots(self):
+        f, converged = SinglePoint.find_roots(
+            SinglePoint.model, 0.1, 0, 1-1e-9, 
+            (self.S_ratio, *self.parameters))
+        self.assertTrue(converged.all())
+        numpy.testing.assert_allclose(f, self.f)
+        
+        # Compare with the per-voxel solver
+        for index in range(len(self.f)):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                expected = scipy.optimize.fsolve(
+                    lambda x: mpf.model(
+                        x[0], self.S_ratio[index], *[
+                            x[index] if numpy.ndim(x) else x 
+                            for x in self.parameters]),
+                    0.1)
+            self.assertAlmostEqual(f[index], expected[0], 5)
+    
+    def test_estimate_f_map(self):
+        shape = (10, 10, 25)
+        f0 = 0.1
+        for jobs in [1, 2]:
+            f, converged = SinglePoint.estimate_f_map(
+                self.S_ratio.reshape(shape), 
+                *[x.reshape(shape) for x in self.parameters[:5]],
+                *self.parameters[5:], f0, jobs)
+            self.assertEqual(f.shape, shape)
+            self.assertTrue(converged.all())
+            numpy.testing.assert_allclose(f.ravel(), self.f)
+    
+    def test_lookup_table(self):
+        R1, T2_free, delta_omega, omega_1_rms, G, TR, duration, flip_angle = (
+            self.parameters)
+        table = SinglePoint.get_lookup_table(
+            TR, duration, flip_angle, 
+            SinglePoint.omega_1_rms_gaussian_pulse(12e-3, numpy.radians(560)),
+            4000, 11e-6)
+        
+        # NOTE: the lookup table uses the lineshape at the grid points
+        G = SinglePoint.get_lineshape(delta_omega, 11e-6)
+        S_ratio = -SinglePoint.model(
+            self.f, 0, R1, T2_free, delta_omega, omega_1_rms, G, 
+            TR, duration, flip_angle)
+        
+        f, inside = SinglePoint.invert_lookup_table(
+            table, S_ratio, R1, omega_1_rms, delta_omega)
+        self.assertTrue(inside.all())
+        numpy.testing.assert_allclose(f, self.f, atol=1e-3)
+        
+        error = SinglePoint.get_lookup_table_error(
+            f, S_ratio, R1, T2_free, delta_omega, omega_1_rms, G,
+            TR, duration, flip_angle, 0.1)
+        self.assertLess(error.max(), 1e-3)
+        
+        # Out of the table
+        f, inside = SinglePoint.invert_lookup_table(
+            table, numpy.array([0.5, 2]), R1[:2], omega_1_rms[:2]*10, 
+            delta_omega[:2])
+        self.assertTrue(numpy.isnan(f).all())
+        self.assertFalse(inside.any())
+    
+    def test_mpf_map(self):
+        directory = tempfile.mkdtemp()
+        try:
+            shape = (4, 5, 6)
+            T1 = numpy.random.default_rng(0).uniform(0.7, 1.6, shape)
+            delta_omega = 4000.
+            omega_1_rms = SinglePoint.omega_1_rms_gaussian_pulse(
+                12e-3, numpy.radians(560))
+            S_ratio = -SinglePoint.model(
+                0.1, 0, 1/T1, 0.022*T1, delta_omega, omega_1_rms, 
+                SinglePoint.get_lineshape(delta_omega, 11e-6),
+                30e-3, 12e-3, numpy.radians(10))
+            mask = numpy.zeros(shape)
+            mask[1:3] = 1
+            
+            paths = {}
+            for name, array in [
+                    ["MT_off", numpy.ones(shape)], ["MT_on", S_ratio], 
+                    ["B0_map", numpy.zeros(shape)], 
+                    ["B1_map", numpy.ones(shape)],
+                    ["T1_map", T1], ["mask", mask]]:
+                paths[name] = os.path.join(directory, "{}.nii".format(name))
+                nibabel.save(
+                    nibabel.Nifti1Image(array, numpy.eye(4)), paths[name])
+            paths["MPF_map"] = os.path.join(directory, "MPF.nii")
+            
+            for inversion in ["root_finding", "lookup_table"]:
+                SinglePoint.mpf_map(
+                    paths["MT_off"], paths["MT_on"], 
+                    numpy.radians(560), 12e-3, 4000, numpy.radians(10), 30e-3,
+                    paths["B0_map"], paths["B1_map"], paths["T1_map"], 
+                    paths["MPF_map"], 1, inversion, paths["mask"])
+                MPF = nibabel.load(paths["MPF_map"]).get_fdata()
+                numpy.testing.assert_allclose(MPF[mask != 0], 10, atol=1e-2)
+                self.assertTrue(numpy.isnan(MPF[mask == 0]).all())
+        finally:
+            shutil.rmtree(directory)
+    
+    def test_no_root(self):
+        S_ratio = numpy.array([2., numpy.nan])
+        f, converged = SinglePoint.find_roots(
+            SinglePoint.model, 0.1, 0, 1-1e-9, 
+            (S_ratio, *[
+                x[:2] if numpy.ndim(x) else x for x in self.parameters]))
+        self.assertTrue(numpy.isnan(f).all())
+        self.assertFalse(converged.any())
+
+if __name__ == "__main__":
+    unittest.main()
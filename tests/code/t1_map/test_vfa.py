@@ -3,6 +3,7 @@ import os
 import tempfile
 import unittest
 import shutil
+import unittest.mock
 
 import nibabel
 import numpy
@@ -20,6 +21,14 @@ class TestVFA(ModuleAndCLITestCase, unittest.TestCase):
     def setUp(self):
         self.directory = tempfile.mkdtemp()
         
+        environment = unittest.mock.patch.dict(
+            os.environ, {"ERWIN_CACHE": os.path.join(self.directory, "cache")})
+        environment.start()
+        self.addCleanup(environment.stop)
+        
+        erwin.t1_map.VFA.rf_spoiling_correction.cache_clear()
+        self.addCleanup(erwin.t1_map.VFA.rf_spoiling_correction.cache_clear)
+        
         template = os.path.join(self.input_path, "GRE", "{}_deg_magnitude.{}")
         
         sources = []
@@ -59,5 +68,97 @@ class TestVFA(ModuleAndCLITestCase, unittest.TestCase):
     def tearDown(self):
         shutil.rmtree(self.directory)
 
+class TestVFAFit(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+        random = numpy.random.default_rng(0)
+        self.T1 = random.uniform(0.6, 2, (4, 5, 6))
+        B1 = random.uniform(0.8, 1.2, self.T1.shape)
+        
+        self.B1_map = os.path.join(self.directory, "B1.nii")
+        nibabel.save(nibabel.Nifti1Image(B1, numpy.eye(4)), self.B1_map)
+        
+        self.flip_angles = numpy.radians([3, 8, 15, 25]).tolist()
+        self.repetition_time = 15e-3
+        E1 = numpy.exp(-self.repetition_time/self.T1)
+        self.sources = []
+        for index, flip_angle in enumerate(self.flip_angles):
+            alpha = B1*flip_angle
+            signal = numpy.sin(alpha) * (1-E1) / (1-E1*numpy.cos(alpha))
+            path = os.path.join(self.directory, "{}.nii".format(index))
+            nibabel.save(nibabel.Nifti1Image(signal, numpy.eye(4)), path)
+            self.sources.append(path)
+        
+        self.target = os.path.join(self.directory, "T1.nii")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_unweighted(self):
+        self._test(False)
+    
+    def test_weighted(self):
+        self._test(True)
+    
+    def test_mismatch(self):
+        with self.assertRaises(Exception):
+            erwin.t1_map.VFA(
+                self.sources, self.flip_angles[:2], 2.5e-3,
+                self.repetition_time, self.B1_map, self.target)
+    
+    def _test(self, weighted):
+        # Disable the RF-spoiling correction, since the signals follow the
+        # Ernst equation
+        with unittest.mock.patch.object(
+                erwin.t1_map.VFA, "rf_spoiling_correction",
+                lambda *args: ([0], [1])):
+            erwin.t1_map.VFA.t1_map(
+                self.sources, self.flip_angles, 2.5e-3, self.repetition_time,
+                self.B1_map, self.target, weighted)
+        
+        T1 = nibabel.load(self.target).get_fdata()
+        numpy.testing.assert_allclose(T1, self.T1, rtol=1e-6)
+
+class TestRFSpoilingCorrection(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+        environment = unittest.mock.patch.dict(
+            os.environ, {"ERWIN_CACHE": self.directory})
+        environment.start()
+        self.addCleanup(environment.stop)
+        
+        erwin.t1_map.VFA.rf_spoiling_correction.cache_clear()
+        self.addCleanup(erwin.t1_map.VFA.rf_spoiling_correction.cache_clear)
+        
+        self.protocol = (tuple(numpy.radians([6, 32]).tolist()), 2.5e-3, 15e-3)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_cache(self):
+        # First call: compute and store the parameters
+        pA, pB = erwin.t1_map.VFA.rf_spoiling_correction(*self.protocol)
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.directory, "vfa_rf_spoiling"))),
+            1)
+        
+        # Second call in a "new process": read the parameters from the disk
+        erwin.t1_map.VFA.rf_spoiling_correction.cache_clear()
+        with unittest.mock.patch.object(
+                erwin.t1_map.VFA, "rf_spoiling_correction_paremeters",
+                side_effect=AssertionError):
+            cached_pA, cached_pB = erwin.t1_map.VFA.rf_spoiling_correction(
+                *self.protocol)
+        
+        fresh_pA, fresh_pB = (
+            erwin.t1_map.VFA.rf_spoiling_correction_paremeters(
+                *self.protocol))
+        for cached, first, fresh in [
+                [cached_pA, pA, fresh_pA], [cached_pB, pB, fresh_pB]]:
+            numpy.testing.assert_array_equal(cached, first)
+            numpy.testing.assert_array_equal(cached, fresh)
+
 if __name__ == "__main__":
     unittest.main()
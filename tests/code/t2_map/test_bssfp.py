@@ -56,5 +56,66 @@ class TestbSSFP(ModuleAndCLITestCase, unittest.TestCase):
         self.baseline = os.path.join(self.baseline_path, "t2_map/bssfp.nii.gz")
         self.result = self.arguments["target"]
 
+class TestbSSFPSlabs(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+        random = numpy.random.default_rng(0)
+        shape = (5, 6, 7)
+        
+        self.sources, self.flip_angles, self.phase_increments = [], [], []
+        for phi, flip_angle in itertools.product(
+                [315, 45, 225, 135], [0.9, 0.2, 0.5, 0.7]):
+            path = os.path.join(
+                self.directory, "{}_{}.nii".format(flip_angle, phi))
+            nibabel.save(
+                nibabel.Nifti1Image(
+                    random.uniform(0.1, 1, shape), numpy.eye(4)),
+                path)
+            self.sources.append(path)
+            self.flip_angles.append(flip_angle)
+            self.phase_increments.append(numpy.radians(phi))
+        
+        self.B1_map = os.path.join(self.directory, "B1.nii")
+        nibabel.save(
+            nibabel.Nifti1Image(random.uniform(0.8, 1.2, shape), numpy.eye(4)),
+            self.B1_map)
+        self.T1_map = os.path.join(self.directory, "T1.nii")
+        nibabel.save(
+            nibabel.Nifti1Image(random.uniform(0.5, 2, shape), numpy.eye(4)),
+            self.T1_map)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_slabs(self):
+        arguments = [
+            list(self.sources), list(self.flip_angles),
+            list(self.phase_increments), 5e-3, self.B1_map, self.T1_map]
+        
+        targets = []
+        for slab_size in [2**22, 2*5*6, 1]:
+            targets.append(
+                os.path.join(self.directory, "{}.nii".format(slab_size)))
+            erwin.t2_map.bSSFP.t2_map(
+                *arguments, targets[-1], slab_size=slab_size)
+        
+        # The lists of the caller are not reordered
+        self.assertEqual(
+            arguments[:3],
+            [self.sources, self.flip_angles, self.phase_increments])
+        
+        # Compressed images are read as streams
+        for index, path in enumerate(arguments[0]):
+            image = nibabel.load(path)
+            arguments[0][index] = path.replace(".nii", ".nii.gz")
+            nibabel.save(image, arguments[0][index])
+        targets.append(os.path.join(self.directory, "compressed.nii"))
+        erwin.t2_map.bSSFP.t2_map(*arguments, targets[-1], slab_size=2*5*6)
+        
+        T2_maps = [nibabel.load(x).get_fdata() for x in targets]
+        for T2_map in T2_maps[1:]:
+            numpy.testing.assert_equal(T2_map, T2_maps[0])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import nibabel
+import numpy
+
+import erwin
+
+class TestpSSFP(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+        environment = unittest.mock.patch.dict(
+            os.environ, {"ERWIN_CACHE": os.path.join(self.directory, "cache")})
+        environment.start()
+        self.addCleanup(environment.stop)
+        
+        erwin.t2_map.pSSFP.get_xi_interpolant.cache_clear()
+        self.addCleanup(erwin.t2_map.pSSFP.get_xi_interpolant.cache_clear)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_interpolate_xi(self):
+        flip_angle = numpy.radians(
+            numpy.random.default_rng(0).uniform(0.4, 180, 1000))
+        eta = 0.5*(1+numpy.cos(flip_angle))/(1-numpy.cos(flip_angle))
+        numpy.testing.assert_allclose(
+            erwin.t2_map.pSSFP.interpolate_xi(eta),
+            erwin.t2_map.pSSFP.compute_xi(eta, 20000), rtol=1e-8)
+    
+    def test_t2_map(self):
+        random = numpy.random.default_rng(0)
+        shape = (4, 5, 6)
+        flip_angle, repetition_time = numpy.radians(40), 10e-3
+        phase_increments = numpy.radians([1, 10]).tolist()
+        B1 = random.uniform(0.1, 1.5, shape)
+        T2 = random.uniform(20e-3, 200e-3, shape)
+        
+        # Signal model of de Sousa et al., with a T1 large enough to make the
+        # bias negligible
+        alpha = flip_angle*B1
+        eta = 0.5*(1+numpy.cos(alpha))/(1-numpy.cos(alpha))
+        xi = erwin.t2_map.pSSFP.compute_xi(eta, 20000)
+        a = (xi*T2/(2*repetition_time))**2
+        
+        sources = []
+        for index, phase_increment in enumerate(phase_increments):
+            sources.append(
+                os.path.join(self.directory, "{}.nii".format(index)))
+            nibabel.save(
+                nibabel.Nifti1Image(
+                    1/numpy.sqrt(1 + a*phase_increment**2), numpy.eye(4)),
+                sources[-1])
+        B1_map = os.path.join(self.directory, "B1.nii")
+        nibabel.save(nibabel.Nifti1Image(B1, numpy.eye(4)), B1_map)
+        target = os.path.join(self.directory, "T2.nii")
+        
+        erwin.run([
+            erwin.t2_map.pSSFP(
+                sources, flip_angle, phase_increments, repetition_time, B1_map,
+                "1e12", target)])
+        numpy.testing.assert_allclose(
+            nibabel.load(target).get_fdata(), T2, rtol=1e-6)
+
+if __name__ == "__main__":
+    unittest.main()
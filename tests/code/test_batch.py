@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import nibabel
+import numpy
+
+import erwin.batch
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        self.sources = []
+        for index in range(3):
+            path = os.path.join(self.directory, "T1_{}.nii.gz".format(index))
+            nibabel.save(
+                nibabel.Nifti1Image(
+                    (1+index)*numpy.ones((2, 3, 4)), numpy.eye(4)),
+                path)
+            self.sources.append(path)
+        self.targets = [
+            os.path.join(self.directory, "R1_{}.nii.gz".format(index))
+            for index in range(3)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_csv(self):
+        manifest = os.path.join(self.directory, "manifest.csv")
+        with open(manifest, "w") as fd:
+            fd.write("source,destination,range\n")
+            for source, target in zip(self.sources, self.targets):
+                fd.write("{},{},0.4 0.9\n".format(source, target))
+
+        self._run(manifest, [0.9, 0.5, 0.4])
+
+    def test_csv_quoted(self):
+        directory = os.path.join(self.directory, "with space")
+        os.mkdir(directory)
+        self.targets = [
+            os.path.join(directory, os.path.basename(x)) for x in self.targets]
+
+        manifest = os.path.join(self.directory, "manifest.csv")
+        with open(manifest, "w") as fd:
+            fd.write("source,destination\n")
+            for source, target in zip(self.sources, self.targets):
+                fd.write("{},'{}'\n".format(source, target))
+
+        self._run(manifest, [1, 0.5, 1/3])
+
+    def test_flags(self):
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--on", action="store_true")
+        parser.add_argument("--off", action="store_false")
+        parser.add_argument("--value")
+
+        self.assertEqual(
+            erwin.batch.to_command_line(
+                {"on": "yes", "off": "true", "value": "no"}, parser),
+            ["--on", "--value", "no"])
+        self.assertEqual(
+            erwin.batch.to_command_line(
+                {"on": False, "off": False, "value": ["a", "b"]}, parser),
+            ["--off", "--value", "a", "b"])
+        with self.assertRaises(Exception):
+            erwin.batch.to_command_line({"on": "maybe"}, parser)
+
+    def test_json(self):
+        manifest = os.path.join(self.directory, "manifest.json")
+        with open(manifest, "w") as fd:
+            json.dump(
+                [
+                    {"source": x, "destination": y}
+                    for x, y in zip(self.sources, self.targets)],
+                fd)
+
+        self._run(manifest, [1, 0.5, 1/3])
+
+    def _run(self, manifest, expected):
+        subprocess.check_call([
+            sys.executable, "-m", "erwin", "batch", "misc.time_to_rate",
+            manifest, "-j", "2"])
+        for target, value in zip(self.targets, expected):
+            numpy.testing.assert_allclose(
+                nibabel.load(target).get_fdata(), value)
+
+if __name__ == "__main__":
+    unittest.main()
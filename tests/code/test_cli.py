@@ -0,0 +1,84 @@
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+import erwin.cli
+
+module_source = '''
+from erwin.cli import *
+
+class Task(object):
+    """ Test task.
+    """
+
+    def __init__(
+            self, source: str, values: Tuple[float, ...],
+            mode: Optional[Choice["a", "b"]]="a", flag: Flag=True):
+        """ :param source: Path to the source
+            :param values: Values
+            :param mode: Mode
+            :param flag: Flag
+        """
+'''
+
+class TestCLI(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        environment = unittest.mock.patch.dict(
+            os.environ, {"ERWIN_CACHE": os.path.join(self.directory, "cache")})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        # Module of the task, which can be modified by the tests
+        self.module_path = os.path.join(self.directory, "cli_task.py")
+        with open(self.module_path, "w") as fd:
+            fd.write(module_source)
+        sys.path.insert(0, self.directory)
+        self.addCleanup(sys.path.remove, self.directory)
+        self.addCleanup(sys.modules.pop, "cli_task", None)
+        self.class_ = importlib.import_module("cli_task").Task
+
+        # Copy of the CLI module, whose modification time can be changed
+        self.cli_path = os.path.join(self.directory, "cli.py")
+        shutil.copy(erwin.cli.__file__, self.cli_path)
+        cli_file = unittest.mock.patch.object(
+            erwin.cli, "__file__", self.cli_path)
+        cli_file.start()
+        self.addCleanup(cli_file.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        arguments = erwin.cli.get_arguments(self.class_)
+        with unittest.mock.patch.object(
+                erwin.cli, "build_arguments", side_effect=AssertionError):
+            cached = erwin.cli.get_arguments(self.class_)
+        self.assertEqual(cached, arguments)
+        self.assertEqual(cached, erwin.cli.build_arguments(self.class_))
+
+    def test_module_changed(self):
+        self._test_invalidation(self.module_path)
+
+    def test_cli_changed(self):
+        self._test_invalidation(self.cli_path)
+
+    def _test_invalidation(self, path):
+        erwin.cli.get_arguments(self.class_)
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns+10**9))
+        with unittest.mock.patch.object(
+                erwin.cli, "build_arguments",
+                wraps=erwin.cli.build_arguments) as build_arguments:
+            erwin.cli.get_arguments(self.class_)
+            erwin.cli.get_arguments(self.class_)
+        self.assertEqual(build_arguments.call_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
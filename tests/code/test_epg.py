@@ -0,0 +1,88 @@
+import unittest
+
+import numpy
+
+from erwin import epg
+
+try:
+    import sycomore
+except ImportError:
+    sycomore = None
+
+class TestEPG(unittest.TestCase):
+    def setUp(self):
+        self.T1 = numpy.linspace(0.6, 1.8, 5)
+        self.flip_angle = numpy.radians([4, 20, 60])
+        self.phase_step_increment = numpy.radians(50)
+        self.TE, self.TR = 2.5e-3, 15e-3
+    
+    def test_ernst(self):
+        # Without transverse coherences, the signal is given by the Ernst
+        # equation
+        T1, T2 = self.T1[:, None], 1e-3
+        signal = epg.simulate_spgr(
+            T1, T2, self.flip_angle, self.phase_step_increment,
+            self.TE, self.TR, 2000)
+        self.assertEqual(signal.shape, (len(self.T1), len(self.flip_angle)))
+        
+        E1 = numpy.exp(-self.TR/T1)
+        ernst = (
+            numpy.sin(self.flip_angle) * (1-E1)
+            / (1-E1*numpy.cos(self.flip_angle)))
+        numpy.testing.assert_allclose(
+            signal, ernst*numpy.exp(-self.TE/T2), rtol=1e-5)
+    
+    def test_broadcast(self):
+        batch = epg.simulate_spgr(
+            self.T1[:, None], 80e-3, self.flip_angle,
+            self.phase_step_increment, self.TE, self.TR, 100)
+        for i, T1 in enumerate(self.T1):
+            for j, flip_angle in enumerate(self.flip_angle):
+                signal = epg.simulate_spgr(
+                    T1, 80e-3, flip_angle, self.phase_step_increment,
+                    self.TE, self.TR, 100)
+                self.assertEqual(signal.shape, ())
+                self.assertAlmostEqual(batch[i, j], signal, 15)
+    
+    def test_tolerance(self):
+        arguments = [
+            self.T1[:, None], 80e-3, self.flip_angle,
+            self.phase_step_increment, self.TE, self.TR, 3000]
+        steady_state = epg.simulate_spgr(*arguments)
+        signal = epg.simulate_spgr(*arguments, tolerance=1e-4)
+        numpy.testing.assert_allclose(signal, steady_state, rtol=1e-4)
+    
+    def test_afi(self):
+        # Without transverse coherences, the signals are given by the closed
+        # form of Yarnykh
+        T1, tr_ratio = self.T1[:, None], 5
+        S1, S2 = epg.simulate_afi(
+            T1, 1e-4, self.flip_angle, self.phase_step_increment, self.TR,
+            tr_ratio, 500)
+        self.assertEqual(S1.shape, (len(self.T1), len(self.flip_angle)))
+        
+        E1, E2 = [numpy.exp(-x/T1) for x in [self.TR, tr_ratio*self.TR]]
+        cos, sin = numpy.cos(self.flip_angle), numpy.sin(self.flip_angle)
+        denominator = 1-E1*E2*cos**2
+        numpy.testing.assert_allclose(
+            S1, sin*(1-E2+(1-E1)*E2*cos)/denominator, rtol=1e-10)
+        numpy.testing.assert_allclose(
+            S2, sin*(1-E1+(1-E2)*E1*cos)/denominator, rtol=1e-10)
+    
+    @unittest.skipIf(sycomore is None, "sycomore is not available")
+    def test_sycomore(self):
+        from erwin.t1_map.vfa import VFA
+        from sycomore.units import rad, s
+        
+        T1, T2 = 1, 80e-3
+        batch = epg.simulate_spgr(
+            T1, T2, self.flip_angle, self.phase_step_increment,
+            self.TE, self.TR)
+        for flip_angle, signal in zip(self.flip_angle, batch):
+            reference = VFA.simulate_spgr(
+                T1*s, T2*s, flip_angle*rad, self.phase_step_increment*rad,
+                self.TE*s, self.TR*s)
+            self.assertAlmostEqual(signal, reference, 6)
+
+if __name__ == "__main__":
+    unittest.main()
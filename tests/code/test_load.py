@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import nibabel
+import numpy
+
+import erwin
+import erwin.image_cache
+
+class TestLoad(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "image.nii.gz")
+        self.array = numpy.random.random((4, 5, 6, 7))
+        nibabel.save(nibabel.Nifti1Image(self.array, numpy.eye(4)), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load(self):
+        image = erwin.load(self.path)
+        numpy.testing.assert_equal(image.get_fdata(), self.array)
+
+    def test_slice(self):
+        image = erwin.load("{}[...,2]".format(self.path))
+        numpy.testing.assert_equal(image.get_fdata(), self.array[..., 2])
+
+        image = erwin.load("{}[1:3,...,0:7:2]".format(self.path))
+        numpy.testing.assert_equal(
+            image.get_fdata(), self.array[1:3, ..., 0:7:2])
+
+    def test_cache(self):
+        path = os.path.join(self.directory, "cached.nii.gz")
+        with erwin.image_cache.enabled(2*self.array.nbytes) as cache:
+            erwin.save(nibabel.Nifti1Image(self.array, numpy.eye(4)), path)
+            self.assertEqual(cache.size, self.array.nbytes)
+
+            image = erwin.load(path)
+            self.assertIsInstance(image.dataobj, numpy.ndarray)
+            numpy.testing.assert_equal(image.get_fdata(), self.array)
+
+            # Modifying the loaded image must not modify the cache
+            image.get_fdata()[:] = 0
+            numpy.testing.assert_equal(
+                erwin.load("{}[...,2]".format(path)).get_fdata(),
+                self.array[..., 2])
+
+            # Entries are invalidated when the file is modified
+            nibabel.save(nibabel.Nifti1Image(2*self.array, numpy.eye(4)), path)
+            numpy.testing.assert_equal(
+                erwin.load(path).get_fdata(), 2*self.array)
+            self.assertEqual(cache.size, 0)
+
+            # Least-recently used images are evicted
+            for index in range(3):
+                erwin.save(
+                    nibabel.Nifti1Image(self.array, numpy.eye(4)),
+                    os.path.join(self.directory, "{}.nii".format(index)))
+            self.assertEqual(cache.size, 2*self.array.nbytes)
+            self.assertIsNone(
+                cache.get(os.path.join(self.directory, "0.nii")))
+
+        self.assertIsNone(erwin.image_cache.get_cache())
+
+if __name__ == "__main__":
+    unittest.main()
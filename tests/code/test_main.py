@@ -12,6 +12,22 @@ class TestMain(unittest.TestCase):
     def test_list(self):
         output = subprocess.check_output(
             [sys.executable, "-m", "erwin", "--list"])
+    
+    def test_registry(self):
+        output = subprocess.check_output([
+            sys.executable, "-c",
+            "import sys; import erwin.registry; "
+            "registry = erwin.registry.get_registry(); "
+            "print(registry['b0_map.double_echo']); "
+            "print(registry['meta_data.get']); "
+            "print(len([x for x in sys.modules if x[6:] in registry]))"])
+        double_echo, get, modules_count = output.decode().splitlines()
+        self.assertEqual(
+            double_echo,
+            "ΔB₀ map (in Hz) using the phase difference between two echoes.")
+        self.assertEqual(get, "Print the value of a meta-data item.")
+        # The registry must not import the methods
+        self.assertEqual(int(modules_count), 0)
 
 if __name__ == "__main__":
     unittest.main()
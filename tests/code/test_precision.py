@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import nibabel
+import numpy
+
+import erwin
+from erwin import precision
+
+class TestPrecision(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        random = numpy.random.default_rng(0)
+        self.MT_off = os.path.join(self.directory, "MT_off.nii")
+        self.MT_on = os.path.join(self.directory, "MT_on.nii")
+        MT_off = random.uniform(0.5, 1, (4, 5, 6))
+        for path, data in [(self.MT_off, MT_off), (self.MT_on, 0.8*MT_off)]:
+            nibabel.save(nibabel.Nifti1Image(data, numpy.eye(4)), path)
+        self.target = os.path.join(self.directory, "MTR.nii")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_default(self):
+        self.assertEqual(precision.get_dtype(), "float64")
+
+    def test_using(self):
+        with precision.using(numpy.float32) as dtype:
+            self.assertEqual(dtype, "float32")
+            self.assertEqual(precision.get_dtype(), "float32")
+        self.assertEqual(precision.get_dtype(), "float64")
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            precision.set_dtype("float16")
+        self.assertEqual(precision.get_dtype(), "float64")
+
+    def test_complex(self):
+        self.assertEqual(precision.get_complex_dtype("float32"), "complex64")
+        self.assertEqual(precision.get_complex_dtype("float64"), "complex128")
+
+    def test_module(self):
+        with precision.using("float32"):
+            task = erwin.mt_map.MTR(self.MT_off, self.MT_on, self.target)
+        # The precision is stored in the task
+        erwin.run([task])
+        self._check()
+
+    def test_cli(self):
+        subprocess.check_call([
+            sys.executable, "-m", "erwin", "mt_map.mtr",
+            "--mt-off", self.MT_off, "--mt-on", self.MT_on,
+            "--target", self.target, "--precision", "float32"])
+        self._check()
+
+    def _check(self):
+        image = nibabel.load(self.target)
+        self.assertEqual(image.get_data_dtype(), numpy.float32)
+        numpy.testing.assert_allclose(image.get_fdata(), 0.2, rtol=1e-6)
+
+if __name__ == "__main__":
+    unittest.main()
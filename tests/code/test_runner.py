@@ -0,0 +1,164 @@
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import erwin
+import erwin.runner
+
+def write(source, target):
+    content = ""
+    if source is not None:
+        with open(source) as fd:
+            content = fd.read()
+    with open(target, "w") as fd:
+        fd.write(content + os.path.basename(target))
+
+def fail():
+    raise Exception("Failure")
+
+class Task(object):
+    def __init__(self, source, target, action=write):
+        self.basename = target
+        self.file_dep = [source] if source is not None else []
+        self.targets = [target]
+        if action is write:
+            self.actions = [(write, (source, target))]
+        else:
+            self.actions = [(action, ())]
+
+class TestRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_order(self):
+        a, b, c = [os.path.join(self.directory, x) for x in "abc"]
+        # Unordered tasks
+        tasks = [Task(b, c), Task(a, b), Task(None, a)]
+        for jobs in [1, 2]:
+            statuses = erwin.run(tasks, jobs)
+            self.assertEqual(statuses, 3*[erwin.runner.DONE])
+            with open(c) as fd:
+                self.assertEqual(fd.read(), "abc")
+
+    def test_failure(self):
+        a, b, c = [os.path.join(self.directory, x) for x in "abc"]
+        tasks = [Task(None, a, fail), Task(a, b), Task(None, c)]
+        for jobs in [1, 2]:
+            with self.assertRaises(Exception):
+                erwin.run(tasks, jobs)
+
+            statuses = erwin.run(tasks, jobs, keep_going=True)
+            self.assertEqual(
+                statuses, [
+                    erwin.runner.FAILED, erwin.runner.SKIPPED,
+                    erwin.runner.DONE])
+
+    def test_state(self):
+        a, b, c = [os.path.join(self.directory, x) for x in "abc"]
+        with open(a, "w") as fd:
+            fd.write("a")
+        state = os.path.join(self.directory, "state.json")
+
+        tasks = [Task(b, c), Task(a, b)]
+        self.assertEqual(
+            erwin.run(tasks, state=state), 2*[erwin.runner.DONE])
+        self.assertEqual(
+            erwin.run(tasks, state=state), 2*[erwin.runner.UP_TO_DATE])
+
+        # Modify the content of the source
+        with open(a, "w") as fd:
+            fd.write("A")
+        self.assertEqual(
+            erwin.run(tasks, state=state), 2*[erwin.runner.DONE])
+        with open(c) as fd:
+            self.assertEqual(fd.read(), "Abc")
+
+        # Modify the parameters of a task
+        tasks[0].actions = [(write, (a, c))]
+        self.assertEqual(
+            erwin.run(tasks, state=state),
+            [erwin.runner.DONE, erwin.runner.UP_TO_DATE])
+
+    def test_state_partial(self):
+        a, b = [os.path.join(self.directory, x) for x in "ab"]
+        with open(a, "w") as fd:
+            fd.write("a")
+        state = os.path.join(self.directory, "state.json")
+        trace = os.path.join(self.directory, "trace.json")
+
+        task = Task(a, b)
+        task.actions = [(functools.partial(write, a), (b,))]
+        self.assertEqual(
+            erwin.run([task], state=state, trace=trace), [erwin.runner.DONE])
+        self.assertEqual(
+            erwin.run([task], state=state), [erwin.runner.UP_TO_DATE])
+
+        # Modify the bound arguments of the action
+        task.actions = [(functools.partial(write, None), (b,))]
+        self.assertEqual(erwin.run([task], state=state), [erwin.runner.DONE])
+
+        # Builtin action
+        task.actions = [(print, ())]
+        self.assertEqual(erwin.run([task], state=state), [erwin.runner.DONE])
+
+    def test_many_up_to_date(self):
+        paths = [
+            os.path.join(self.directory, str(x)) for x in range(1501)]
+        with open(paths[0], "w") as fd:
+            fd.write("0")
+        state = os.path.join(self.directory, "state.json")
+
+        tasks = [Task(x, y) for x, y in zip(paths[:-1], paths[1:])]
+        self.assertEqual(
+            erwin.run(tasks, state=state), 1500*[erwin.runner.DONE])
+        self.assertEqual(
+            erwin.run(tasks, state=state), 1500*[erwin.runner.UP_TO_DATE])
+
+    def test_trace(self):
+        a, b = [os.path.join(self.directory, x) for x in "ab"]
+        trace = os.path.join(self.directory, "trace.json")
+        for jobs in [1, 2]:
+            erwin.run([Task(a, b), Task(None, a)], jobs, trace=trace)
+            with open(trace) as fd:
+                events = json.load(fd)["traceEvents"]
+            self.assertEqual(
+                [(x["name"], x["cat"]) for x in events], [
+                    (a, "task"), ("write", "action"),
+                    (b, "task"), ("write", "action")])
+            for event in events:
+                self.assertGreater(event["args"]["written_bytes"], 0)
+
+    @unittest.skipIf(sys.platform == "win32", "No peak memory on Windows")
+    def test_peak_memory(self):
+        a, b = [os.path.join(self.directory, x) for x in "ab"]
+        trace = os.path.join(self.directory, "trace.json")
+
+        # Large child process, followed by a task without child process
+        large = Task(None, a)
+        large.actions = [[
+            sys.executable, "-c",
+            "x = bytearray(400*2**20); open({!r}, 'w').write('a')".format(a)]]
+        erwin.run([large, Task(a, b)], trace=trace)
+        with open(trace) as fd:
+            events = {
+                x["name"]: x["args"] for x in json.load(fd)["traceEvents"]
+                if x["cat"] == "task"}
+
+        self.assertGreater(events[a]["children_peak_memory"], 400*2**20)
+        self.assertIsNone(events[b]["children_peak_memory"])
+        self.assertLess(events[b]["peak_memory"], 400*2**20)
+
+    def test_cycle(self):
+        a, b = [os.path.join(self.directory, x) for x in "ab"]
+        with self.assertRaises(Exception):
+            erwin.run([Task(a, b), Task(b, a)])
+
+if __name__ == "__main__":
+    unittest.main()